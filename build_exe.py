@@ -7,6 +7,11 @@ SRT字幕翻译工具 - 打包脚本
 使用方法：
 python build_exe.py                 # 完整打包
 python build_exe.py --check-only    # 仅检查文件排除设置
+python build_exe.py --rebuild       # 清除PyInstaller缓存后完整重新打包
+python build_exe.py --force         # 源文件未变化时也重新打包
+python build_exe.py --verbose       # 打包前显示文件排除设置
+python build_exe.py --fast-start    # 完全禁用UPX压缩，加快程序冷启动
+python build_exe.py --log-level DEBUG  # 输出PyInstaller详细日志，用于排查可进一步排除的模块
 
 依赖：
 pip install pyinstaller
@@ -21,10 +26,24 @@ import os
 import sys
 import shutil
 import subprocess
+import platform
 import json
+import re
 import fnmatch
+import functools
+import hashlib
+from collections import deque
 from pathlib import Path
 
+# 打包失败时显示的最后输出行数
+BUILD_ERROR_TAIL_LINES = 50
+
+
+@functools.lru_cache(maxsize=None)
+def _translate_glob(pattern):
+    """将通配符模式转换为正则表达式（大小写/路径分隔符按当前系统规范化），结果缓存"""
+    return fnmatch.translate(os.path.normcase(pattern))
+
 
 class SRTTranslatorBuilder:
     """SRT翻译工具打包器"""
@@ -34,13 +53,47 @@ class SRTTranslatorBuilder:
         self.dist_dir = self.script_dir / "dist"
         self.build_dir = self.script_dir / "build"
         self.output_dir = self.script_dir / "SRT翻译工具"
+        # PyInstaller直接输出到最终目录的同级位置，保证与output_dir在同一文件系统，整理时只需重命名
+        self.collect_dir = self.output_dir.parent / "SRT字幕翻译工具"
+        
+        # 是否强制完整重建（清除PyInstaller缓存），默认复用build/中的缓存进行增量打包
+        self.force_rebuild = False
+        
+        # 是否使用UPX压缩（--fast-start 时关闭）
+        self.use_upx = True
+        
+        # 不使用UPX压缩的大型运行时DLL：未压缩的DLL可被系统直接映射，启动时无需解压
+        self.upx_exclude = [
+            'vcruntime140.dll', 'msvcp140.dll', 'python3*.dll',
+            'tcl86t.dll', 'tk86t.dll', '_tkinter.pyd', 'api-ms-win-*.dll',
+        ]
+        
+        # 是否忽略源文件哈希，强制执行PyInstaller（--force）
+        self.force = False
+        
+        # 打包前是否显示文件排除设置（仅供参考，不影响打包结果）
+        self.verbose = False
+        
+        # 目标架构：仅macOS支持指定（x86_64/arm64），其他系统保持None由PyInstaller自动选择
+        self.target_arch = platform.machine() if sys.platform == 'darwin' else None
+        
+        # PyInstaller日志级别（None表示使用默认级别）
+        self.log_level = None
+        
+        # 程序不会用到的标准库/第三方模块，从打包结果中排除以减小体积、加快启动
+        self.exclude_modules = [
+            'test', 'unittest', 'pydoc', 'pydoc_data', 'doctest',
+            'distutils', 'setuptools', 'pip', 'lib2to3', 'ensurepip', 'venv',
+            'turtle', 'turtledemo', 'idlelib', 'xmlrpc',
+            'pdb', 'profile', 'cProfile', 'bz2', 'lzma',
+        ]
         
         # 需要包含的文件列表
         self.include_files = [
             "srt_translator_gui.py",
             "srt_translator.py", 
             "srt_checker.py",
-    
+            "srt_parser.py",
         ]
         
         # 不需要包含的文件/目录（会在运行时自动生成）
@@ -56,6 +109,7 @@ class SRTTranslatorBuilder:
             # 进度和临时文件
             "*_progress*.json",
             "*_batch*.srt",
+            ".build_env_cache.json",
             
             # Python缓存和构建文件
             "__pycache__",
@@ -92,12 +146,71 @@ class SRTTranslatorBuilder:
             
             # 项目特定目录
             "SRT翻译工具/",
+            "SRT字幕翻译工具/",
             ".历史文件备份（请忽略）/",
             
             # 用户数据文件（运行时生成）
             "*.sqlite",
             "*.db"
         ]
+        
+        # 预编译排除模式
+        self._classify_patterns()
+        
+        # 遍历时直接跳过的目录（先做集合判断，再回退到排除正则）
+        self._prune_dirs = {
+            '__pycache__', 'build', 'dist', '.venv', 'venv', 'env',
+            '.git', '.vscode', '.idea', 'SRT翻译工具', 'SRT字幕翻译工具'
+        }
+    
+    def _classify_patterns(self):
+        """将排除模式拆分为后缀集合、文件名集合和剩余通配符正则，加速逐文件匹配"""
+        glob_chars = set('*?[')
+        self._suffix_map = {}     # 扩展名 -> 模式，如 '.log' -> '*.log'
+        self._basename_map = {}   # 文件名 -> 模式，如 'thumbs.db' -> 'Thumbs.db'
+        self._compiled_excludes = []  # 剩余的通配符模式
+        
+        for pattern in self.exclude_patterns:
+            normalized = os.path.normcase(pattern)
+            suffix = normalized[1:]
+            if (normalized.startswith('*.') and not glob_chars & set(suffix)
+                    and os.sep not in suffix and '/' not in suffix):
+                self._suffix_map.setdefault(suffix, pattern)
+            elif not glob_chars & set(normalized) and not pattern.endswith('/'):
+                self._basename_map.setdefault(normalized, pattern)
+            else:
+                self._compiled_excludes.append(
+                    (pattern, re.compile(_translate_glob(pattern)))
+                )
+        
+        self._glob_re = re.compile('|'.join(
+            f'(?:{regex.pattern})' for _, regex in self._compiled_excludes
+        ))
+        # 完整的合并正则，用于目录剪枝
+        self._exclude_re = re.compile('|'.join(
+            f'(?:{_translate_glob(p)})' for p in self.exclude_patterns
+        ))
+    
+    def _should_prune_dir(self, dir_name):
+        """判断遍历时是否跳过整个目录"""
+        if dir_name in self._prune_dirs:
+            return True
+        return bool(self._exclude_re.match(os.path.normcase(dir_name + '/')) or
+                    self._exclude_re.match(os.path.normcase(dir_name)))
+    
+    def _match_exclude_pattern(self, relative_path, name):
+        """返回命中的排除模式，未命中返回None（路径需已经过os.path.normcase处理）"""
+        _, dot, ext = name.rpartition('.')
+        if dot and '.' + ext in self._suffix_map:
+            return self._suffix_map['.' + ext]
+        if name in self._basename_map:
+            return self._basename_map[name]
+        if not (self._glob_re.match(relative_path) or self._glob_re.match(name)):
+            return None
+        for pattern, regex in self._compiled_excludes:
+            if regex.match(relative_path) or regex.match(name):
+                return pattern
+        return None
     
     def check_dependencies(self):
         """检查打包依赖"""
@@ -152,7 +265,10 @@ class SRTTranslatorBuilder:
         """清理之前的打包结果"""
         print("\n🧹 清理之前的打包结果...")
         
-        dirs_to_clean = [self.build_dir, self.dist_dir, self.output_dir]
+        dirs_to_clean = [self.dist_dir, self.collect_dir, self.output_dir]
+        # build/ 保存PyInstaller的分析结果和PYZ缓存，仅在 --rebuild 时清除
+        if self.force_rebuild:
+            dirs_to_clean.insert(0, self.build_dir)
         
         for dir_path in dirs_to_clean:
             if dir_path.exists():
@@ -168,6 +284,7 @@ class SRTTranslatorBuilder:
         
         spec_content = f'''# -*- mode: python ; coding: utf-8 -*-
 import os
+from PyInstaller.utils.hooks import collect_data_files
 
 block_cipher = None
 
@@ -178,33 +295,19 @@ a = Analysis(
     datas=[
         ('srt_translator.py', '.'),
         ('srt_checker.py', '.'),
-    ],
-    hiddenimports=[
-        'customtkinter',
-        'tkinter',
-        'tkinter.ttk',
-        'tkinter.font',
-        'tkinter.messagebox',
-        'tkinter.filedialog',
-        'requests',
-        'json',
-        'logging',
-        'threading',
-        'queue',
-        'concurrent.futures',
-        're',
-        'time',
-        'os',
-        'sys'
-    ],
+        ('srt_parser.py', '.'),
+    ] + collect_data_files('customtkinter'),  # customtkinter主题等运行时资源
+    # 其余模块均为静态导入，PyInstaller分析时会自动发现，无需列出
+    hiddenimports=['customtkinter'],
     hookspath=[],
     hooksconfig={{}},
     runtime_hooks=[],
-    excludes=[],
+    excludes={self.exclude_modules!r},
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
     noarchive=False,
+    optimize=2,  # 以优化级别2编译打包的字节码（等同 python -OO），去除assert和文档字符串
 )
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
@@ -213,16 +316,17 @@ pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 exe = EXE(
     pyz,
     a.scripts,
-    [],
+    # 运行时解释器同样使用优化级别2，与Analysis的optimize=2保持一致（这两项本身不会去除任何内容）
+    [('O', None, 'OPTION'), ('O', None, 'OPTION')],
     exclude_binaries=True,  # 关键：这让PyInstaller使用onedir模式
     name='SRT字幕翻译工具',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx={self.use_upx},
     console=False,  # 无控制台窗口
     disable_windowed_traceback=False,
-    target_arch=None,
+    target_arch={self.target_arch!r},
     codesign_identity=None,
     entitlements_file=None,
     icon=None,  # 如果有图标文件可以在这里指定
@@ -234,15 +338,19 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
-    upx_exclude=[],
+    upx={self.use_upx},
+    upx_exclude={self.upx_exclude!r},
     name='SRT字幕翻译工具',
 )
 '''
         
         spec_file = self.script_dir / "srt_translator.spec"
-        with open(spec_file, 'w', encoding='utf-8') as f:
-            f.write(spec_content)
+        # 内容未变化时不重写，保持修改时间不变，避免触发不必要的重新打包
+        if spec_file.exists() and spec_file.read_text(encoding='utf-8') == spec_content:
+            print(f"✅ 规格文件未变化: {spec_file.name}")
+            return spec_file
+        
+        spec_file.write_bytes(spec_content.encode('utf-8'))
             
         print(f"✅ 已创建规格文件: {spec_file.name}")
         return spec_file
@@ -254,58 +362,52 @@ coll = COLLECT(
         
         try:
             # 构建PyInstaller命令
-            cmd = [
-                sys.executable, "-m", "PyInstaller",
-                "--clean",  # 清理缓存
+            cmd = [sys.executable, "-m", "PyInstaller"]
+            if self.force_rebuild:
+                cmd.append("--clean")  # 清理缓存，仅在 --rebuild 时使用
+            if self.log_level:
+                cmd += ["--log-level", self.log_level]
+            cmd += [
                 "--noconfirm",  # 不要确认覆盖
+                "--distpath", str(self.collect_dir.parent),  # 直接输出到最终目录旁，避免跨盘复制
                 str(spec_file)
             ]
             
             print(f"执行命令: {' '.join(cmd)}")
             
-            # 执行打包命令 - 改进编码处理
-            result = subprocess.run(
-                cmd, 
+            # 执行打包命令 - 逐行读取输出并实时显示，不在内存中缓存完整日志
+            process = subprocess.Popen(
+                cmd,
                 cwd=self.script_dir,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
                 encoding='utf-8',
-                errors='replace'  # 遇到编码错误时替换为?，避免崩溃
+                errors='replace',  # 遇到编码错误时替换为?，避免崩溃
+                bufsize=1
             )
             
-            if result.returncode == 0:
+            # 保留最近的输出（不过滤），打包失败时完整显示错误信息
+            recent_lines = deque(maxlen=BUILD_ERROR_TAIL_LINES)
+            for line in process.stdout:
+                line = line.rstrip()
+                if not line.strip() or 'UnicodeDecodeError' in line:
+                    continue
+                recent_lines.append(line)
+                # 实时输出时跳过一些常见的无害警告
+                if ('deprecation' not in line.lower() and
+                    'warning' not in line.lower()):
+                    print(f"   {line}")
+            
+            returncode = process.wait()
+            if returncode == 0:
                 print("✅ 打包成功！")
-                
-                # 显示警告信息（如果有）
-                if result.stderr and result.stderr.strip():
-                    # 过滤掉常见的无害警告
-                    stderr_lines = result.stderr.strip().split('\n')
-                    important_warnings = []
-                    for line in stderr_lines:
-                        # 跳过编码相关的错误和一些常见的无害警告
-                        if ('UnicodeDecodeError' not in line and 
-                            'deprecation' not in line.lower() and
-                            'warning' not in line.lower() and
-                            line.strip()):
-                            important_warnings.append(line)
-                    
-                    if important_warnings:
-                        print("⚠️  打包过程中的信息:")
-                        for warning in important_warnings[:5]:  # 只显示前5条重要信息
-                            print(f"   {warning}")
-                        if len(important_warnings) > 5:
-                            print(f"   ... 还有 {len(important_warnings) - 5} 条信息")
-                
                 return True
             else:
-                print("❌ 打包失败！")
-                print("错误输出:")
-                # 清理错误输出中的编码问题
-                error_output = result.stderr or "未知错误"
-                error_lines = error_output.split('\n')
-                for line in error_lines:
-                    if line.strip() and 'UnicodeDecodeError' not in line:
-                        print(f"   {line}")
+                print(f"❌ 打包失败！(退出码: {returncode})")
+                print(f"错误输出（最后 {len(recent_lines)} 行）:")
+                for line in recent_lines:
+                    print(f"   {line}")
                 return False
                 
         except Exception as e:
@@ -317,7 +419,7 @@ coll = COLLECT(
         print("\n📦 整理输出文件...")
         
         # onedir模式会生成一个文件夹，查找生成的可执行文件
-        exe_dir = self.dist_dir / "SRT字幕翻译工具"
+        exe_dir = self.collect_dir
         exe_file = exe_dir / "SRT字幕翻译工具.exe"
         
         if not exe_file.exists():
@@ -328,8 +430,11 @@ coll = COLLECT(
         if self.output_dir.exists():
             shutil.rmtree(self.output_dir)
         
-        # 直接重命名dist目录中的文件夹为我们想要的输出目录
-        shutil.move(str(exe_dir), str(self.output_dir))
+        # 直接重命名生成的文件夹为我们想要的输出目录（同一文件系统，无需复制文件）
+        try:
+            os.rename(exe_dir, self.output_dir)
+        except OSError:
+            shutil.move(str(exe_dir), str(self.output_dir))
         print(f"✅ 已整理可执行文件目录")
         
         # 创建使用说明
@@ -374,8 +479,8 @@ coll = COLLECT(
 '''
         
         readme_file = self.output_dir / "使用说明.txt"
-        with open(readme_file, 'w', encoding='utf-8') as f:
-            f.write(readme_content)
+        # 一次性编码后以二进制写入，保留系统换行符以便记事本正常显示
+        readme_file.write_bytes(readme_content.replace('\n', os.linesep).encode('utf-8'))
         print(f"✅ 已创建使用说明: {readme_file.name}")
         
 
@@ -386,9 +491,8 @@ coll = COLLECT(
         """清理构建文件"""
         print("\n🧹 清理构建文件...")
         
+        # build/ 和规格文件保留，供下次增量打包使用
         files_to_clean = [
-            self.script_dir / "srt_translator.spec",
-            self.build_dir,
             self.dist_dir
         ]
         
@@ -408,10 +512,16 @@ coll = COLLECT(
         if not self.output_dir.exists():
             return "未知"
         
-        total_size = 0
-        for file_path in self.output_dir.rglob('*'):
-            if file_path.is_file():
-                total_size += file_path.stat().st_size
+        def _iter_sizes(path):
+            # DirEntry自带文件类型信息，每个文件只需一次stat
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from _iter_sizes(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.stat(follow_symlinks=False).st_size
+        
+        total_size = sum(_iter_sizes(self.output_dir))
         
         # 转换为可读格式
         if total_size < 1024:
@@ -421,58 +531,83 @@ coll = COLLECT(
         else:
             return f"{total_size / (1024 * 1024):.1f} MB"
     
+    def _iter_files(self, root, stats):
+        """基于os.scandir递归遍历文件，跳过被排除的目录（文件类型直接取自目录项，无需额外stat）"""
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._should_prune_dir(entry.name):
+                        stats['pruned_dirs'] += 1
+                        continue
+                    yield from self._iter_files(entry.path, stats)
+                elif entry.is_file():
+                    yield entry
+    
     def check_exclusions(self):
         """检查并显示会被排除的文件"""
         print("\n🔍 检查文件排除设置...")
         
-        all_files = []
-        excluded_files = []
+        total_count = 0
+        # 只保留需要显示的前几个文件，其余仅计数，内存占用与排除文件数量无关
+        config_preview, config_limit, config_count = [], 10, 0
+        other_preview, other_limit, other_count = [], 5, 0
+        
+        # 遍历当前目录下的所有文件，被排除的目录整体跳过，不再深入
+        stats = {'pruned_dirs': 0}
+        for entry in self._iter_files(self.script_dir, stats):
+            file_name = entry.name
+            total_count += 1
+            relative_path = os.path.relpath(entry.path, self.script_dir)
+            
+            # 检查是否匹配排除模式
+            pattern = self._match_exclude_pattern(
+                os.path.normcase(relative_path), os.path.normcase(file_name)
+            )
+            if pattern is None:
+                continue
+            
+            lower_path = relative_path.lower()
+            if 'config' in lower_path or 'progress' in lower_path or relative_path.endswith('.log'):
+                config_count += 1
+                if len(config_preview) < config_limit:
+                    config_preview.append(f"   🔒 {relative_path} (匹配: {pattern})")
+            else:
+                other_count += 1
+                if len(other_preview) < other_limit:
+                    other_preview.append(f"   📄 {relative_path} (匹配: {pattern})")
+        
+        print(f"📂 总文件数: {total_count}")
+        print(f"🚫 排除文件数: {config_count + other_count}")
+        print(f"📁 跳过的排除目录数: {stats['pruned_dirs']}")
         
-        # 遍历当前目录下的所有文件
-        for item in self.script_dir.rglob("*"):
-            if item.is_file():
-                relative_path = item.relative_to(self.script_dir)
-                all_files.append(str(relative_path))
-                
-                # 检查是否匹配排除模式
-                should_exclude = False
-                for pattern in self.exclude_patterns:
-                    if fnmatch.fnmatch(str(relative_path), pattern) or fnmatch.fnmatch(item.name, pattern):
-                        should_exclude = True
-                        excluded_files.append((str(relative_path), pattern))
-                        break
-        
-        print(f"📂 总文件数: {len(all_files)}")
-        print(f"🚫 排除文件数: {len(excluded_files)}")
-        
-        if excluded_files:
+        if config_count or other_count:
             print("\n📋 被排除的文件:")
-            config_files = []
-            other_files = []
-            
-            for file_path, pattern in excluded_files:
-                if 'config' in file_path.lower() or 'progress' in file_path.lower() or file_path.endswith('.log'):
-                    config_files.append(f"   🔒 {file_path} (匹配: {pattern})")
-                else:
-                    other_files.append(f"   📄 {file_path} (匹配: {pattern})")
             
-            if config_files:
+            if config_preview:
                 print("   🔐 敏感配置文件 (包含API密钥等):")
-                for item in config_files[:10]:  # 最多显示10个
+                for item in config_preview:
                     print(item)
-                if len(config_files) > 10:
-                    print(f"      ... 还有 {len(config_files) - 10} 个配置文件")
+                if config_count > len(config_preview):
+                    print(f"      ... 还有 {config_count - len(config_preview)} 个配置文件")
             
-            if other_files:
+            if other_preview:
                 print("   📁 其他开发文件:")
-                for item in other_files[:5]:  # 最多显示5个
+                for item in other_preview:
                     print(item)
-                if len(other_files) > 5:
-                    print(f"      ... 还有 {len(other_files) - 5} 个其他文件")
+                if other_count > len(other_preview):
+                    print(f"      ... 还有 {other_count - len(other_preview)} 个其他文件")
         
         print("\n✅ 排除设置检查完成！")
         return True
     
+    def _compute_source_hash(self, spec_file):
+        """计算源文件和规格文件内容的SHA-256，用于判断是否需要重新打包"""
+        digest = hashlib.sha256()
+        for file_path in [self.script_dir / name for name in self.include_files] + [spec_file]:
+            digest.update(file_path.name.encode('utf-8'))
+            digest.update(file_path.read_bytes())
+        return digest.hexdigest()
+    
     def build(self):
         """执行完整的打包流程"""
         print("🚀 SRT字幕翻译工具 - 开始打包")
@@ -486,26 +621,37 @@ coll = COLLECT(
         if not self.check_source_files():
             return False
         
-        # 检查文件排除设置
-        if not self.check_exclusions():
-            return False
-        
-        # 清理之前的构建
-        self.clean_previous_build()
+        # 检查文件排除设置（仅用于显示，打包内容由spec文件决定，只在 --verbose 时执行）
+        if self.verbose:
+            self.check_exclusions()
         
         # 创建规格文件
         spec_file = self.create_pyinstaller_spec()
         
-        # 执行打包
-        if not self.build_executable(spec_file):
-            return False
-        
-        # 整理输出
-        if not self.organize_output():
-            return False
-        
-        # 清理构建文件
-        self.cleanup_build_files()
+        # 源文件和规格文件均未变化且输出完整时，跳过打包
+        source_hash = self._compute_source_hash(spec_file)
+        hash_file = self.output_dir / ".build_hash"
+        exe_file = self.output_dir / "SRT字幕翻译工具.exe"
+        if (not self.force and not self.force_rebuild and exe_file.exists() and
+                hash_file.exists() and hash_file.read_text(encoding='utf-8').strip() == source_hash):
+            print("\n✅ 源文件未变化, 跳过打包")
+        else:
+            # 清理之前的构建（保留build/缓存以便增量打包）
+            self.clean_previous_build()
+            
+            # 执行打包
+            if not self.build_executable(spec_file):
+                return False
+            
+            # 整理输出
+            if not self.organize_output():
+                return False
+            
+            # 记录本次打包的源文件哈希
+            hash_file.write_text(source_hash, encoding='utf-8')
+            
+            # 清理构建文件
+            self.cleanup_build_files()
         
         # 显示结果
         output_size = self.get_output_size()
@@ -528,6 +674,17 @@ def main():
     """主函数"""
     builder = SRTTranslatorBuilder()
     
+    if "--rebuild" in sys.argv[1:]:
+        builder.force_rebuild = True
+    if "--force" in sys.argv[1:]:
+        builder.force = True
+    if "--verbose" in sys.argv[1:]:
+        builder.verbose = True
+    if "--fast-start" in sys.argv[1:]:
+        builder.use_upx = False
+    if "--log-level" in sys.argv[1:-1]:
+        builder.log_level = sys.argv[sys.argv.index("--log-level") + 1].upper()
+    
     # 检查命令行参数
     if len(sys.argv) > 1 and sys.argv[1] == "--check-only":
         print("🔍 仅检查文件排除设置...")
@@ -5,17 +5,108 @@ SRT字幕翻译工具 - 环境检查脚本
 用于排查打包环境问题和依赖
 
 使用方法：
-python check_build_env.py
+python check_build_env.py              # 完整检查
+python check_build_env.py --no-cache   # 忽略缓存，重新检查所有模块
 """
 
+import io
 import os
 import sys
+import json
+import site
+import functools
 import importlib
 import subprocess
 import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
+ENV_CACHE_FILE = Path(__file__).parent.absolute() / ".build_env_cache.json"
+USE_ENV_CACHE = "--no-cache" not in sys.argv[1:]
+
+
+def _env_cache_key():
+    """生成环境缓存键：Python版本、解释器路径和所有site-packages目录的修改时间（目录都不存在时返回None，不使用缓存）"""
+    # Windows上getsitepackages()的第一项是sys.prefix本身，需要把全部目录都算进去
+    try:
+        site_dirs = list(site.getsitepackages())
+    except AttributeError:
+        site_dirs = []
+    try:
+        site_dirs.append(site.getusersitepackages())
+    except AttributeError:
+        pass
+    
+    mtimes = []
+    for site_dir in site_dirs:
+        try:
+            mtimes.append(f"{site_dir}={os.path.getmtime(site_dir)}")
+        except OSError:
+            continue
+    if not mtimes:
+        return None
+    return f"{sys.version}|{sys.executable}|{'|'.join(mtimes)}"
+
+
+def _load_env_cache():
+    """读取环境检查缓存"""
+    try:
+        with open(ENV_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_env_cache(cache):
+    """保存环境检查缓存"""
+    try:
+        with open(ENV_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+    except OSError:
+        pass
+
+
+class _ThreadLocalStdout:
+    """按线程缓冲输出：并行检查时各线程写入自己的缓冲区，避免输出交错"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+    
+    def set_buffer(self, buffer):
+        self._local.buffer = buffer
+    
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        return (buffer or self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+
+
+@functools.lru_cache(maxsize=None)
+def _is_writable(path):
+    """检查目录是否可写（不创建任何测试文件）"""
+    return os.access(path, os.W_OK)
+
+
+def _run_check(check_func, stdout):
+    """在工作线程中执行检查，返回(结果, 输出)"""
+    buffer = io.StringIO()
+    stdout.set_buffer(buffer)
+    try:
+        try:
+            result = check_func()
+        except Exception as e:
+            print(f"检查过程出错: {e}")
+            result = False
+    finally:
+        stdout.set_buffer(None)
+    return result, buffer.getvalue()
+
+
 def print_separator(title):
     """打印分隔符"""
     print(f"\n{'='*50}")
@@ -44,6 +135,13 @@ def check_required_modules():
     """检查必需模块"""
     print_separator("必需模块检查")
     
+    cache_key = _env_cache_key()
+    use_cache = USE_ENV_CACHE and cache_key is not None
+    cache = _load_env_cache() if use_cache else {}
+    if cache.get(cache_key) == 'ok':
+        print("✅ 所有必需模块已安装（环境未变化，使用缓存结果）")
+        return
+    
     required_modules = [
         ("tkinter", "GUI框架"),
         ("customtkinter", "现代GUI组件"),
@@ -77,8 +175,14 @@ def check_required_modules():
         print(f"\n缺少模块: {', '.join(missing_modules)}")
         print("请安装缺少的模块:")
         print(f"pip install {' '.join(missing_modules)}")
+        # 有模块缺失时使缓存失效
+        if cache_key in cache:
+            del cache[cache_key]
+            _save_env_cache(cache)
     else:
         print("\n✅ 所有必需模块已安装")
+        if cache_key is not None:
+            _save_env_cache({cache_key: 'ok'})
 
 
 def check_build_tools():
@@ -124,7 +228,8 @@ def check_source_files():
     required_files = [
         "srt_translator_gui.py",
         "srt_translator.py",
-        "srt_checker.py"
+        "srt_checker.py",
+        "srt_parser.py"
     ]
     
     optional_files = [
@@ -165,24 +270,19 @@ def check_permissions():
     current_dir = Path.cwd()
     
     # 检查当前目录写权限
-    try:
-        test_file = current_dir / "test_write_permission.tmp"
-        with open(test_file, 'w') as f:
-            f.write("test")
-        os.remove(test_file)
+    # 注：Windows上os.access仅参考只读属性，不检查ACL，但足以作为打包前的基本检查
+    if _is_writable(str(current_dir)):
         print("✅ 当前目录可写")
-    except Exception as e:
-        print(f"❌ 当前目录写权限测试失败: {e}")
+    else:
+        print("❌ 当前目录写权限测试失败: 当前目录不可写")
         return False
     
     # 检查系统临时目录
     import tempfile
-    try:
-        with tempfile.NamedTemporaryFile(delete=True) as tmp:
-            tmp.write(b"test")
+    if _is_writable(tempfile.gettempdir()):
         print("✅ 系统临时目录可写")
-    except Exception as e:
-        print(f"❌ 系统临时目录权限测试失败: {e}")
+    else:
+        print("❌ 系统临时目录权限测试失败: 临时目录不可写")
         return False
     
     return True
@@ -286,27 +386,40 @@ def main():
     print("🔍 SRT字幕翻译工具 - 环境检查")
     print(f"检查时间: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # 执行所有检查
-    checks = [
+    # 执行所有检查：相互独立的检查并行执行，输出按原顺序显示
+    parallel_checks = [
         check_python_version,
         check_required_modules,
         check_build_tools,
         check_source_files,
         check_permissions,
-        check_disk_space,
-        test_gui_import
+        check_disk_space
     ]
     
     all_passed = True
-    for check_func in checks:
-        try:
-            result = check_func()
-            if result is False:
-                all_passed = False
-        except Exception as e:
-            print(f"检查过程出错: {e}")
+    stdout = _ThreadLocalStdout(sys.stdout)
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(_run_check, check_func, stdout)
+                       for check_func in parallel_checks]
+            results = [future.result() for future in futures]
+    finally:
+        sys.stdout = stdout._stream
+    
+    for result, output in results:
+        print(output, end='')
+        if result is False:
             all_passed = False
     
+    # GUI测试需要创建Tk根窗口，必须在主线程执行
+    try:
+        if test_gui_import() is False:
+            all_passed = False
+    except Exception as e:
+        print(f"检查过程出错: {e}")
+        all_passed = False
+    
     # 提供建议
     provide_recommendations()
     
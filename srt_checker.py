@@ -4,13 +4,17 @@
 import os
 import re
 import sys
+import mmap
 import argparse
 import random
-from typing import List, Dict, Tuple, Optional
+from array import array
+from typing import List, Dict, Tuple, Optional, Iterator
 import logging
 import colorama
 from colorama import Fore, Style
 
+from srt_parser import SRTEntry, iter_srt_file, _NUMBER_RE, _TIMECODE_RE
+
 # 初始化colorama以支持彩色输出
 colorama.init()
 
@@ -25,111 +29,264 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SRT-Checker")
 
-# 定义SRT条目的正则表达式
-SRT_PATTERN = re.compile(
-    r'(\d+)\s*\n'               # 字幕序号
-    r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})\s*\n'  # 时间码
-    r'((?:.+(?:\n|$))+?)'       # 字幕内容（可能多行，最后一行可能没有换行符）
-    r'(?:\n|$)',                # 空行或文件结尾
-    re.MULTILINE
-)
+# 仅解析时间码时直接在内存映射的字节数据上匹配，不解码整个文件。
+# 纯ASCII行的空白字符与str.strip()/正则\s对ASCII的判断一致，含非ASCII字符的行解码后按srt_parser的规则处理，
+# 保证两条解析路径对空行和序号的判断相同
+_ASCII_WHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+# 非ASCII空白字符（U+0085、U+00A0、U+1680、U+2000-U+205F、U+3000）UTF-8编码的首字节
+_SPACE_LEAD_BYTES = b'\xc2\xe1\xe2\xe3'
+_NUMBER_RE_BYTES = re.compile(rb'^\d+[ \t\n\r\x0b\x0c\x1c-\x1f]*$')
+_TIMECODE_RE_BYTES = re.compile(rb'^(\d\d:\d\d:\d\d,\d\d\d)[ \t\n\r\x0b\x0c\x1c-\x1f]*-->'
+                                rb'[ \t\n\r\x0b\x0c\x1c-\x1f]*(\d\d:\d\d:\d\d,\d\d\d)[ \t\n\r\x0b\x0c\x1c-\x1f]*$')
 
-class SRTEntry:
-    """表示SRT文件中的一个字幕条目"""
-    def __init__(self, number: int, start_time: str, end_time: str, content: str):
-        self.number = number
-        self.start_time = start_time
-        self.end_time = end_time
-        self.content = content.strip()
-    
-    def to_string(self) -> str:
-        """将字幕条目转换为SRT格式字符串"""
-        return f"{self.number}\n{self.start_time} --> {self.end_time}\n{self.content}\n"
+# 文件超过此大小且不需要输出报告时，先只解析时间码进行比较
+_TIMECODES_ONLY_MIN_SIZE = 5 * 1024 * 1024
+
+# 控制台输出模板（颜色前缀只拼接一次）
+_SAMPLE_TEMPLATE = f"\n{Fore.CYAN}{{title}} (#{{number}}):{Style.RESET_ALL}\n时间码: {{start}} --> {{end}}\n原文: {{content}}"
+_MISMATCH_HEADER_TEMPLATE = f"{Fore.CYAN}条目 #{{number}}:{Style.RESET_ALL}"
+_ISSUE_TEMPLATE = f"\n  {Fore.RED}- {{issue}}{Style.RESET_ALL}"
+
+# 逐行解析的状态
+_EXPECT_NUMBER = 0
+_EXPECT_TIMECODE = 1
+_COLLECT_TEXT = 2
+
+def _iter_timecodes(srt_file_path: str) -> Iterator[Tuple[int, str, str, int]]:
+    """通过内存映射逐行扫描SRT文件，只解码序号和时间码，逐个生成(序号, 起始时间码, 结束时间码, 内容起始位置)元组"""
+    if os.path.getsize(srt_file_path) == 0:
+        return
     
-    def __str__(self) -> str:
-        return self.to_string()
+    with open(srt_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        match_number_bytes = _NUMBER_RE_BYTES.match
+        match_timecode_bytes = _TIMECODE_RE_BYTES.match
+        match_number_text = _NUMBER_RE.match
+        match_timecode_text = _TIMECODE_RE.match
+        state = _EXPECT_NUMBER
+        number = 0
+        start_time = end_time = ''
+        content_offset = 0
+        
+        first_line = True
+        for line in iter(mm.readline, b''):
+            if first_line:
+                # 去掉UTF-8 BOM
+                if line.startswith(b'\xef\xbb\xbf'):
+                    line = line[3:]
+                first_line = False
+            stripped = line.strip(_ASCII_WHITESPACE)
+            if stripped.isascii():
+                match_number, match_timecode = match_number_bytes, match_timecode_bytes
+            elif state == _COLLECT_TEXT and stripped[0] not in _SPACE_LEAD_BYTES:
+                # 字幕内容行的首字符不可能是空白，不是空行，无需解码
+                continue
+            else:
+                # 全角空格、不换行空格等也算空白，非ASCII数字也算序号，与iter_srt_file一致
+                stripped = line.decode('utf-8', errors='replace').strip()
+                match_number, match_timecode = match_number_text, match_timecode_text
+            
+            if state == _COLLECT_TEXT:
+                if stripped:
+                    continue
+                yield number, start_time, end_time, content_offset
+                state = _EXPECT_NUMBER
+            elif state == _EXPECT_TIMECODE:
+                if not stripped:
+                    continue
+                match = match_timecode(stripped)
+                if match:
+                    start_time, end_time = match.groups()
+                    if isinstance(start_time, bytes):
+                        start_time = start_time.decode('ascii')
+                        end_time = end_time.decode('ascii')
+                    content_offset = mm.tell()
+                    state = _COLLECT_TEXT
+                elif match_number(stripped):
+                    number = int(stripped)
+                else:
+                    state = _EXPECT_NUMBER
+            elif match_number(stripped):
+                number = int(stripped)
+                state = _EXPECT_TIMECODE
+        
+        # 文件结尾没有空行时，补上最后一个条目
+        if state == _COLLECT_TEXT:
+            yield number, start_time, end_time, content_offset
+
+def _read_contents(srt_file_path: str, offsets: List[int]) -> Dict[int, str]:
+    """从指定的内容起始位置读取字幕内容（读到空行为止），返回{位置: 内容}"""
+    contents = {}
+    with open(srt_file_path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            lines = []
+            for line in iter(f.readline, b''):
+                line = line.decode('utf-8', errors='replace').rstrip()
+                if not line.lstrip():
+                    break
+                lines.append(line)
+            contents[offset] = '\n'.join(lines)
+    return contents
+
+def _load_sample_entries(source_file: str, translated_file: str, source_timecodes: List[Tuple[int, str, str, int]],
+                         translated_timecodes: Dict[int, Tuple[int, str, str, int]],
+                         indices: List[int]) -> Tuple[Dict[int, SRTEntry], Dict[int, SRTEntry]]:
+    """只解析了时间码时，读取要显示的源文件条目（按下标）及对应的翻译文件条目（按编号）"""
+    source_selected = [source_timecodes[i] for i in indices]
+    translated_selected = [translated_timecodes[entry[0]] for entry in source_selected
+                           if entry[0] in translated_timecodes]
+    source_contents = _read_contents(source_file, [entry[3] for entry in source_selected])
+    translated_contents = _read_contents(translated_file, [entry[3] for entry in translated_selected])
     
-    def __repr__(self) -> str:
-        return f"SRTEntry({self.number}, {self.start_time}, {self.end_time}, {self.content})"
+    source_samples = {i: SRTEntry(number, start_time, end_time, source_contents[offset])
+                      for i, (number, start_time, end_time, offset) in zip(indices, source_selected)}
+    translated_samples = {number: SRTEntry(number, start_time, end_time, translated_contents[offset])
+                          for number, start_time, end_time, offset in translated_selected}
+    return source_samples, translated_samples
 
-def parse_srt_file(srt_file_path: str) -> List[SRTEntry]:
-    """解析SRT文件，返回字幕条目列表"""
+def parse_srt_file(srt_file_path: str, parse_timecodes_only: bool = False) -> List:
+    """解析SRT文件，返回字幕条目列表
+    
+    parse_timecodes_only为True时不保存字幕内容，只返回(序号, 起始时间码, 结束时间码, 内容起始位置)元组列表
+    """
     try:
-        with open(srt_file_path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-        
-        # 确保文件末尾有换行符，这样正则表达式更容易匹配最后一个条目
-        if not content.endswith('\n'):
-            content += '\n'
-        
-        entries = []
-        for match in SRT_PATTERN.finditer(content):
-            number = int(match.group(1))
-            start_time = match.group(2)
-            end_time = match.group(3)
-            subtitle_content = match.group(4)
-            
-            entries.append(SRTEntry(number, start_time, end_time, subtitle_content))
+        if parse_timecodes_only:
+            entries = list(_iter_timecodes(srt_file_path))
+        else:
+            entries = list(iter_srt_file(srt_file_path))
         
-        logger.info(f"已从 {srt_file_path} 解析 {len(entries)} 个字幕条目")
+        logger.info("已从 %s 解析 %d 个字幕条目", srt_file_path, len(entries))
         return entries
     
     except Exception as e:
-        logger.error(f"解析SRT文件 {srt_file_path} 出错: {e}")
+        logger.error("解析SRT文件 %s 出错: %s", srt_file_path, e)
         raise
 
+def _entry_columns(entries: List) -> Tuple[array, List[str], List[str]]:
+    """将字幕条目（SRTEntry或时间码元组）拆分为序号、起始时间码、结束时间码三个并行数组，便于批量比较"""
+    if entries and isinstance(entries[0], tuple):
+        numbers = array('q', [entry[0] for entry in entries])
+        starts = [entry[1] for entry in entries]
+        ends = [entry[2] for entry in entries]
+    else:
+        numbers = array('q', [entry.number for entry in entries])
+        starts = [entry.start_time for entry in entries]
+        ends = [entry.end_time for entry in entries]
+    return numbers, starts, ends
+
+def _timecode_issues(src_start: str, src_end: str, trans_start: str, trans_end: str) -> List[str]:
+    """比较一对条目的时间码，返回问题描述列表"""
+    issues = []
+    if src_start != trans_start:
+        issues.append(f"起始时间码不匹配: 源={src_start}, 译={trans_start}")
+    if src_end != trans_end:
+        issues.append(f"结束时间码不匹配: 源={src_end}, 译={trans_end}")
+    return issues
+
+def _format_sample(title: str, entry: SRTEntry, trans_entry: Optional[SRTEntry]) -> str:
+    """格式化一条用于展示的字幕样本（原文及译文）"""
+    text = _SAMPLE_TEMPLATE.format(title=title, number=entry.number, start=entry.start_time,
+                                   end=entry.end_time, content=entry.content)
+    if trans_entry:
+        text += f"\n译文: {trans_entry.content}"
+    return text
+
 def check_srt_files(source_file: str, translated_file: str, output_file: Optional[str] = None) -> bool:
     """检查源SRT文件和翻译后的SRT文件是否匹配"""
     try:
-        # 解析源文件和翻译文件
-        source_entries = parse_srt_file(source_file)
-        translated_entries = parse_srt_file(translated_file)
-        
-        # 检查条目数量是否相同
-        if len(source_entries) != len(translated_entries):
-            logger.error(f"条目数量不匹配: 源文件 {len(source_entries)} 个, 翻译文件 {len(translated_entries)} 个")
-            perfect_match = False
-        else:
-            logger.info(f"条目数量匹配: 源文件和翻译文件均有 {len(source_entries)} 个条目")
-            perfect_match = True
-        
-        # 创建源文件条目字典，方便快速查找
-        source_dict = {entry.number: entry for entry in source_entries}
+        # 大文件且不输出报告时只解析时间码，完美匹配需要显示样本时只读取样本条目的内容
+        timecodes_only = (output_file is None and
+                          max(os.path.getsize(source_file), os.path.getsize(translated_file)) >= _TIMECODES_ONLY_MIN_SIZE)
         
-        # 检查每个条目
         mismatches = []
         missing_numbers = []
         
-        for trans_entry in translated_entries:
-            if trans_entry.number not in source_dict:
-                missing_numbers.append(trans_entry.number)
-                perfect_match = False
-                continue
+        if timecodes_only:
+            # 源文件完整解析，翻译文件流式读取并逐条比较，不在内存中保留翻译文件的条目
+            source_entries = parse_srt_file(source_file, parse_timecodes_only=True)
+            src_numbers, src_starts, src_ends = _entry_columns(source_entries)
+            source_index = {number: i for i, number in enumerate(src_numbers)}
+            
+            translated_entries = None
+            # 翻译文件每个编号第一次出现的条目，完美匹配时用于读取样本内容
+            translated_timecodes = {}
+            translated_count = 0
+            for entry in _iter_timecodes(translated_file):
+                number, trans_start, trans_end, _ = entry
+                translated_count += 1
+                translated_timecodes.setdefault(number, entry)
+                i = source_index.get(number)
+                if i is None:
+                    missing_numbers.append(number)
+                    continue
+                issues = _timecode_issues(src_starts[i], src_ends[i], trans_start, trans_end)
+                if issues:
+                    mismatches.append((number, issues))
+            logger.info("已从 %s 解析 %d 个字幕条目", translated_file, translated_count)
+            translated_numbers = translated_timecodes.keys()
+        else:
+            # 解析源文件和翻译文件
+            source_entries = parse_srt_file(source_file)
+            translated_entries = parse_srt_file(translated_file)
+            translated_count = len(translated_entries)
             
-            source_entry = source_dict[trans_entry.number]
-            issues = []
+            # 检查每个条目：按列比较序号和时间码，避免逐个访问条目属性
+            src_numbers, src_starts, src_ends = _entry_columns(source_entries)
+            trans_numbers, trans_starts, trans_ends = _entry_columns(translated_entries)
+            source_index = {number: i for i, number in enumerate(src_numbers)}
             
-            # 检查时间码
-            if source_entry.start_time != trans_entry.start_time:
-                issues.append(f"起始时间码不匹配: 源={source_entry.start_time}, 译={trans_entry.start_time}")
-                perfect_match = False
+            if src_numbers == trans_numbers and len(source_index) == len(src_numbers):
+                # 序号序列完全一致：整列比较在C层面完成，只有存在差异时才找出不一致的位置
+                if src_starts == trans_starts and src_ends == trans_ends:
+                    pairs = []
+                else:
+                    pairs = [(i, i) for i in range(len(src_numbers))
+                             if src_starts[i] != trans_starts[i] or src_ends[i] != trans_ends[i]]
+            else:
+                pairs = []
+                for j, number in enumerate(trans_numbers):
+                    i = source_index.get(number)
+                    if i is None:
+                        missing_numbers.append(number)
+                    else:
+                        pairs.append((i, j))
             
-            if source_entry.end_time != trans_entry.end_time:
-                issues.append(f"结束时间码不匹配: 源={source_entry.end_time}, 译={trans_entry.end_time}")
-                perfect_match = False
+            for i, j in pairs:
+                issues = _timecode_issues(src_starts[i], src_ends[i], trans_starts[j], trans_ends[j])
+                if issues:
+                    mismatches.append((trans_numbers[j], issues))
             
-            if issues:
-                mismatches.append((trans_entry.number, issues))
+            translated_numbers = set(trans_numbers)
+        
+        # 检查条目数量是否相同
+        if len(source_entries) != translated_count:
+            logger.error("条目数量不匹配: 源文件 %d 个, 翻译文件 %d 个", len(source_entries), translated_count)
+            perfect_match = False
+        else:
+            logger.info("条目数量匹配: 源文件和翻译文件均有 %d 个条目", len(source_entries))
+            perfect_match = True
+        
+        if missing_numbers or mismatches:
+            perfect_match = False
         
         # 检查翻译文件是否缺失源文件中的条目
-        translated_numbers = {entry.number for entry in translated_entries}
-        source_numbers = {entry.number for entry in source_entries}
-        missing_from_translated = source_numbers - translated_numbers
+        source_numbers = set(src_numbers)
+        # 只排序一次，日志、控制台输出和报告共用
+        missing_from_translated = sorted(source_numbers - translated_numbers)
+        missing_numbers.sort()
         
         if missing_from_translated:
-            logger.error(f"翻译文件缺少的条目编号: {', '.join(map(str, sorted(missing_from_translated)))}")
+            logger.error("翻译文件缺少的条目编号: %s", ', '.join(map(str, missing_from_translated)))
             perfect_match = False
         
+        # 创建条目字典，方便快速查找（仅解析了时间码时不需要，完美匹配时只读取要显示的样本）
+        if timecodes_only:
+            source_dict = translated_dict = {}
+        else:
+            source_dict = {entry.number: entry for entry in source_entries}
+            # 翻译文件条目字典（编号重复时保留第一个）
+            translated_dict = {entry.number: entry for entry in reversed(translated_entries)}
+        
         # 输出检查结果
         if perfect_match:
             print(f"{Fore.GREEN}✓ 完美匹配！源文件和翻译文件的时间码和字幕编号完全一致。{Style.RESET_ALL}")
@@ -140,119 +297,117 @@ def check_srt_files(source_file: str, translated_file: str, output_file: Optiona
             print(f"总条目数: {total_entries}")
             
             if total_entries > 0:
-                # 显示第一条字幕
-                first_entry = source_entries[0]
-                print(f"\n{Fore.CYAN}第一条字幕 (#{first_entry.number}):{Style.RESET_ALL}")
-                print(f"时间码: {first_entry.start_time} --> {first_entry.end_time}")
-                print(f"原文: {first_entry.content}")
-                trans_first = next((e for e in translated_entries if e.number == first_entry.number), None)
-                if trans_first:
-                    print(f"译文: {trans_first.content}")
-                
-                # 显示最后一条字幕
-                last_entry = source_entries[-1]
-                print(f"\n{Fore.CYAN}最后一条字幕 (#{last_entry.number}):{Style.RESET_ALL}")
-                print(f"时间码: {last_entry.start_time} --> {last_entry.end_time}")
-                print(f"原文: {last_entry.content}")
-                trans_last = next((e for e in translated_entries if e.number == last_entry.number), None)
-                if trans_last:
-                    print(f"译文: {trans_last.content}")
-                
-                # 显示更多随机抽样的字幕条目
+                # 先确定要显示的条目：第一条、最后一条和随机抽样的条目
                 sample_size = min(8, total_entries - 2)  # 增加到8个样本
+                sample_indices = []
                 if sample_size > 0:
                     # 确保有足够的条目可供抽样
                     try:
                         sample_indices = random.sample(range(1, total_entries-1), sample_size)
-                        print(f"\n{Fore.CYAN}随机抽样的字幕条目 (共{sample_size}个):{Style.RESET_ALL}")
-                        
-                        for idx in sample_indices:
-                            sample_entry = source_entries[idx]
-                            print(f"\n{Fore.CYAN}样本字幕 (#{sample_entry.number}):{Style.RESET_ALL}")
-                            print(f"时间码: {sample_entry.start_time} --> {sample_entry.end_time}")
-                            print(f"原文: {sample_entry.content}")
-                            trans_sample = next((e for e in translated_entries if e.number == sample_entry.number), None)
-                            if trans_sample:
-                                print(f"译文: {trans_sample.content}")
                     except ValueError:
-                        # 如果条目太少无法抽样，则提示用户
-                        print(f"\n{Fore.YELLOW}字幕条目数量较少，无法提供更多随机样本。{Style.RESET_ALL}")
+                        sample_indices = None
+                
+                if timecodes_only:
+                    # 只解析了时间码：按记录的位置读取这几个条目的内容，不再完整解析两个文件
+                    source_samples, translated_dict = _load_sample_entries(
+                        source_file, translated_file, source_entries, translated_timecodes,
+                        [0, total_entries - 1] + (sample_indices or []))
+                else:
+                    source_samples = source_entries
+                
+                # 显示第一条字幕
+                first_entry = source_samples[0]
+                print(_format_sample("第一条字幕", first_entry, translated_dict.get(first_entry.number)))
+                
+                # 显示最后一条字幕
+                last_entry = source_samples[total_entries - 1]
+                print(_format_sample("最后一条字幕", last_entry, translated_dict.get(last_entry.number)))
+                
+                # 显示更多随机抽样的字幕条目
+                if sample_indices:
+                    print(f"\n{Fore.CYAN}随机抽样的字幕条目 (共{sample_size}个):{Style.RESET_ALL}")
+                    
+                    # 循环外绑定字典查找方法，避免每次迭代重复属性查找
+                    trans_get = translated_dict.get
+                    for idx in sample_indices:
+                        sample_entry = source_samples[idx]
+                        print(_format_sample("样本字幕", sample_entry, trans_get(sample_entry.number)))
+                elif sample_indices is None:
+                    # 如果条目太少无法抽样，则提示用户
+                    print(f"\n{Fore.YELLOW}字幕条目数量较少，无法提供更多随机样本。{Style.RESET_ALL}")
         else:
             print(f"{Fore.RED}✗ 检测到不匹配！{Style.RESET_ALL}")
             
             if missing_numbers:
-                print(f"{Fore.YELLOW}翻译文件中存在源文件没有的条目编号: {', '.join(map(str, sorted(missing_numbers)))}{Style.RESET_ALL}")
+                print(f"{Fore.YELLOW}翻译文件中存在源文件没有的条目编号: {', '.join(map(str, missing_numbers))}{Style.RESET_ALL}")
             
             if missing_from_translated:
-                print(f"{Fore.YELLOW}翻译文件缺少的条目编号: {', '.join(map(str, sorted(missing_from_translated)))}{Style.RESET_ALL}")
+                print(f"{Fore.YELLOW}翻译文件缺少的条目编号: {', '.join(map(str, missing_from_translated))}{Style.RESET_ALL}")
             
             if mismatches:
                 print(f"\n{Fore.CYAN}时间码不匹配的条目:{Style.RESET_ALL}")
                 for number, issues in mismatches:
-                    print(f"{Fore.CYAN}条目 #{number}:{Style.RESET_ALL}")
-                    for issue in issues:
-                        print(f"  {Fore.RED}- {issue}{Style.RESET_ALL}")
+                    print(_MISMATCH_HEADER_TEMPLATE.format(number=number) +
+                          ''.join(_ISSUE_TEMPLATE.format(issue=issue) for issue in issues))
         
         # 如果指定了输出文件，将详细报告写入文件
         if output_file:
+            # 先在内存中拼接完整报告，最后一次性写入
+            out = [
+                f"# SRT文件检查报告\n\n"
+                f"源文件: {source_file}\n"
+                f"翻译文件: {translated_file}\n\n"
+                f"## 总体结果\n\n"
+            ]
+            if perfect_match:
+                out.append("✓ 完美匹配！源文件和翻译文件的时间码和字幕编号完全一致。\n\n")
+            else:
+                out.append("✗ 检测到不匹配！\n\n")
+            
+            out.append(f"源文件条目数: {len(source_entries)}\n"
+                       f"翻译文件条目数: {len(translated_entries)}\n\n")
+            
+            if missing_numbers:
+                out.append("## 翻译文件中存在源文件没有的条目编号\n\n")
+                for number in missing_numbers:
+                    entry = translated_dict.get(number)
+                    if entry:
+                        out.append(f"#{number}: {entry.start_time} --> {entry.end_time}\n{entry.content}\n\n")
+            
+            if missing_from_translated:
+                out.append("## 翻译文件缺少的条目编号\n\n")
+                for number in missing_from_translated:
+                    entry = source_dict[number]
+                    out.append(f"#{number}: {entry.start_time} --> {entry.end_time}\n{entry.content}\n\n")
+            
+            if mismatches:
+                out.append("## 时间码不匹配的条目\n\n")
+                for number, issues in mismatches:
+                    source_entry = source_dict[number]
+                    trans_entry = translated_dict.get(number)
+                    
+                    out.append(f"### 条目 #{number}\n\n"
+                               f"**源文件**:\n"
+                               f"{source_entry.start_time} --> {source_entry.end_time}\n"
+                               f"{source_entry.content}\n\n"
+                               f"**翻译文件**:\n")
+                    if trans_entry:
+                        out.append(f"{trans_entry.start_time} --> {trans_entry.end_time}\n"
+                                   f"{trans_entry.content}\n\n")
+                    
+                    out.append("**问题**:\n")
+                    out.extend(f"- {issue}\n" for issue in issues)
+                    out.append("\n")
+            
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(f"# SRT文件检查报告\n\n")
-                f.write(f"源文件: {source_file}\n")
-                f.write(f"翻译文件: {translated_file}\n\n")
-                
-                f.write(f"## 总体结果\n\n")
-                if perfect_match:
-                    f.write("✓ 完美匹配！源文件和翻译文件的时间码和字幕编号完全一致。\n\n")
-                else:
-                    f.write("✗ 检测到不匹配！\n\n")
-                
-                f.write(f"源文件条目数: {len(source_entries)}\n")
-                f.write(f"翻译文件条目数: {len(translated_entries)}\n\n")
-                
-                if missing_numbers:
-                    f.write(f"## 翻译文件中存在源文件没有的条目编号\n\n")
-                    for number in sorted(missing_numbers):
-                        entry = next((e for e in translated_entries if e.number == number), None)
-                        if entry:
-                            f.write(f"#{number}: {entry.start_time} --> {entry.end_time}\n")
-                            f.write(f"{entry.content}\n\n")
-                
-                if missing_from_translated:
-                    f.write(f"## 翻译文件缺少的条目编号\n\n")
-                    for number in sorted(missing_from_translated):
-                        entry = source_dict[number]
-                        f.write(f"#{number}: {entry.start_time} --> {entry.end_time}\n")
-                        f.write(f"{entry.content}\n\n")
-                
-                if mismatches:
-                    f.write(f"## 时间码不匹配的条目\n\n")
-                    for number, issues in mismatches:
-                        source_entry = source_dict[number]
-                        trans_entry = next((e for e in translated_entries if e.number == number), None)
-                        
-                        f.write(f"### 条目 #{number}\n\n")
-                        f.write(f"**源文件**:\n")
-                        f.write(f"{source_entry.start_time} --> {source_entry.end_time}\n")
-                        f.write(f"{source_entry.content}\n\n")
-                        
-                        f.write(f"**翻译文件**:\n")
-                        if trans_entry:
-                            f.write(f"{trans_entry.start_time} --> {trans_entry.end_time}\n")
-                            f.write(f"{trans_entry.content}\n\n")
-                        
-                        f.write(f"**问题**:\n")
-                        for issue in issues:
-                            f.write(f"- {issue}\n")
-                        f.write("\n")
-                
-                logger.info(f"详细报告已写入: {output_file}")
+                f.write(''.join(out))
+            
+            logger.info("详细报告已写入: %s", output_file)
         
         return perfect_match
     
     except Exception as e:
-        logger.error(f"检查SRT文件时出错: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("检查SRT文件时出错: %s", e)
         return False
 
 def main():
@@ -264,14 +419,14 @@ def main():
     args = parser.parse_args()
     
     if not os.path.exists(args.source_file):
-        logger.error(f"源文件不存在: {args.source_file}")
+        logger.error("源文件不存在: %s", args.source_file)
         return 1
     
     if not os.path.exists(args.translated_file):
-        logger.error(f"翻译文件不存在: {args.translated_file}")
+        logger.error("翻译文件不存在: %s", args.translated_file)
         return 1
     
-    logger.info(f"开始检查源文件 {args.source_file} 和翻译文件 {args.translated_file}")
+    logger.info("开始检查源文件 %s 和翻译文件 %s", args.source_file, args.translated_file)
     perfect_match = check_srt_files(args.source_file, args.translated_file, args.output)
     
     # 返回代码: 0表示完全匹配，1表示存在不匹配
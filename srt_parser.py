@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SRT字幕文件解析，供翻译工具和校验工具共用
+"""
+
+import re
+from typing import Iterator
+
+# 序号行和时间码行的正则表达式（每个条目只匹配单行，不再对整个文件做回溯匹配）
+_NUMBER_RE = re.compile(r'^\d+\s*$')
+_TIMECODE_RE = re.compile(r'^(\d\d:\d\d:\d\d,\d\d\d)\s*-->\s*(\d\d:\d\d:\d\d,\d\d\d)\s*$')
+
+# 格式规整的完整条目：序号行、时间码行、若干行尾无空白的内容行，以及之后的空行
+_ENTRY_RE = re.compile(
+    r'[ \t]*(\d+)[ \t]*\n'
+    r'[ \t]*(\d\d:\d\d:\d\d,\d\d\d)[ \t]*-->[ \t]*(\d\d:\d\d:\d\d,\d\d\d)[ \t]*\n'
+    r'((?:[^\n]*\S\n)*)'
+    r'[ \t]*\n'
+)
+
+# 块结尾：换行后紧跟空行（可以只含空白字符）
+_BLOCK_END_RE = re.compile(r'\n[^\S\n]*\n')
+
+# 每次从文件读取的字符数
+_READ_CHUNK_SIZE = 1 << 20
+
+# 逐行解析的状态
+_EXPECT_NUMBER = 0
+_EXPECT_TIMECODE = 1
+_COLLECT_TEXT = 2
+
+class SRTEntry:
+    """表示SRT文件中的一个字幕条目"""
+    __slots__ = ('number', 'start_time', 'end_time', 'content')
+    
+    def __init__(self, number: int, start_time: str, end_time: str, content: str):
+        self.number = number
+        self.start_time = start_time
+        self.end_time = end_time
+        self.content = content.strip()
+    
+    def to_string(self) -> str:
+        """将字幕条目转换为SRT格式字符串"""
+        return f"{self.number}\n{self.start_time} --> {self.end_time}\n{self.content}\n"
+    
+    def __str__(self) -> str:
+        return self.to_string()
+    
+    def __repr__(self) -> str:
+        return f"SRTEntry({self.number}, {self.start_time}, {self.end_time}, {self.content})"
+
+def iter_srt_file(srt_file_path: str) -> Iterator[SRTEntry]:
+    """分块读取SRT文件，逐个生成字幕条目（不一次性读入整个文件）"""
+    with open(srt_file_path, 'r', encoding='utf-8', errors='replace') as f:
+        # 解析规则是逐行的状态机：序号 -> 时间码 -> 字幕内容 -> 空行。
+        # 格式规整的条目（序号行、时间码行、行尾无空白的内容行）用一个正则整体匹配；
+        # 其余的块再逐行走状态机，两种方式得到的结果相同
+        state = _EXPECT_NUMBER
+        number = 0
+        start_time = end_time = ''
+        buf = []
+        
+        # 热循环中用到的方法和常量绑定为局部变量，省去每行的全局/属性查找
+        match_entry = _ENTRY_RE.match
+        search_block_end = _BLOCK_END_RE.search
+        match_number = _NUMBER_RE.match
+        match_timecode = _TIMECODE_RE.match
+        expect_number, expect_timecode, collect_text = _EXPECT_NUMBER, _EXPECT_TIMECODE, _COLLECT_TEXT
+        
+        pending = ''
+        first_chunk = True
+        while True:
+            chunk = f.read(_READ_CHUNK_SIZE)
+            at_eof = not chunk
+            if first_chunk:
+                # 去掉UTF-8 BOM
+                if chunk.startswith('\ufeff'):
+                    chunk = chunk[1:]
+                first_chunk = False
+            
+            text = pending + chunk
+            if at_eof:
+                # 文件结尾视为空行，结束最后一个条目
+                text += '\n\n'
+                pending = ''
+            else:
+                # 只处理到最后一个空行为止，之后不完整的部分留到下一次读取
+                boundary = text.rfind('\n\n')
+                if boundary < 0:
+                    pending = text
+                    continue
+                text, pending = text[:boundary + 2], text[boundary + 2:]
+            
+            pos = 0
+            text_len = len(text)
+            while pos < text_len:
+                if state == expect_number:
+                    match = match_entry(text, pos)
+                    if match:
+                        number_text, start_time, end_time, content = match.groups()
+                        yield SRTEntry(int(number_text), start_time, end_time, content)
+                        pos = match.end()
+                        continue
+                
+                if text[pos] == '\n':
+                    pos += 1
+                    continue
+                
+                # 逐行处理到下一个空行为止
+                block_end = search_block_end(text, pos)
+                block_end = block_end.start() if block_end else text_len
+                # 只含空白的行视为空行；字幕内容行统一去掉行尾空白
+                for line in text[pos:block_end].split('\n'):
+                    line = line.rstrip()
+                    stripped = line.lstrip()
+                    
+                    if state == collect_text:
+                        if stripped:
+                            buf.append(line)
+                            continue
+                        yield SRTEntry(number, start_time, end_time, '\n'.join(buf))
+                        state = expect_number
+                    elif state == expect_timecode:
+                        if not stripped:
+                            continue
+                        match = match_timecode(stripped)
+                        if match:
+                            start_time, end_time = match.groups()
+                            buf = []
+                            state = collect_text
+                        elif match_number(stripped):
+                            number = int(stripped)
+                        else:
+                            state = expect_number
+                    elif match_number(stripped):
+                        number = int(stripped)
+                        state = expect_timecode
+                
+                # 块结束处是空行，结束正在收集的条目
+                if state == collect_text:
+                    yield SRTEntry(number, start_time, end_time, '\n'.join(buf))
+                    state = expect_number
+                pos = block_end + 1
+            
+            if at_eof:
+                break
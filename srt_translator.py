@@ -7,13 +7,19 @@ import json
 import time
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
 import sys
 import glob
+import atexit
+import weakref
 import threading
 import concurrent.futures
-from typing import List, Dict, Tuple, Optional, Union
+from types import MappingProxyType
+from typing import List, Dict, Tuple, Optional, Union, Iterable, Iterator, Mapping
 import logging
 
+from srt_parser import SRTEntry, iter_srt_file
+
 # 设置日志 - 修复Unicode编码问题，兼容PyInstaller打包
 if sys.platform == 'win32':
     # 在Windows上使用UTF-8编码，但需要检查stdout/stderr是否为None（PyInstaller打包时可能为None）
@@ -45,15 +51,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SRT-Translator")
 
-# 定义SRT条目的正则表达式
-SRT_PATTERN = re.compile(
-    r'(\d+)\s*\n'               # 字幕序号
-    r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})\s*\n'  # 时间码
-    r'((?:.+(?:\n|$))+?)'       # 字幕内容（可能多行，最后一行可能没有换行符）
-    r'(?:\n|$)',                # 空行或文件结尾
+# 模型可能生成的多余前缀（合并为一个预编译的正则，一次扫描清理全部前缀）
+_MODEL_PREFIX_RE = re.compile(
+    r"^(?:翻译如下|翻译结果|以下是翻译|中文翻译|要翻译的内容|这是中文翻译|翻译成中文|翻译后的文本)[:：]?\s*",
     re.MULTILINE
 )
 
+# 批量翻译时拆分译文用的编号分隔符
+_SEPARATOR_SPLIT_RE = re.compile(r'\n===SUBTITLE_SEPARATOR_\d+===\n')
+
+# 译文中残留的各种分隔符，合并为一个正则：带编号或无编号的分隔符、简单分隔符---、
+# 下划线数字格式的分隔符(_45=== 等，但不抢先匹配紧跟其后的完整分隔符)
+_SEPARATOR_MARKER_RE = re.compile(
+    r'\n?===SUBTITLE_SEPARATOR(?:_\d+)?===\n?'
+    r'|\n?---\n?'
+    r'|^_\d+===(?!SUBTITLE_SEPARATOR)\s*',
+    re.MULTILINE
+)
+
+# 被模型改动过格式的分隔符（如等号数量、空格、下划线或换行有变化）
+_LOOSE_SEPARATOR_RE = re.compile(r'\s*=+\s*SUBTITLE[_ ]?SEPARATOR(?:[_ ]?\d+)?\s*=+\s*')
+
+# 合并批次时每条字幕额外占用的分隔符字符数（按字符数分批时计入）
+_SEPARATOR_OVERHEAD = len("\n===SUBTITLE_SEPARATOR_00===\n")
+
 # API终端点和密钥 (默认值)
 API_ENDPOINTS = {
     "deepseek": "https://api.deepseek.com/v1/chat/completions",
@@ -139,13 +160,13 @@ class PromptManager:
         except Exception as e:
             logger.error(f"保存提示词配置出错: {e}")
     
-    def get_prompts(self) -> Dict[str, str]:
-        """获取所有提示词"""
-        return self.prompts.copy()
+    def get_prompts(self) -> Mapping[str, str]:
+        """获取所有提示词（只读视图，不复制字典）"""
+        return MappingProxyType(self.prompts)
     
     def get_prompt_names(self) -> List[str]:
         """获取所有提示词名称列表"""
-        return list(self.prompts.keys())
+        return list(self.prompts)
     
     def get_prompt(self, name: str) -> str:
         """获取指定名称的提示词"""
@@ -196,23 +217,37 @@ class PromptManager:
         """判断是否为默认预设提示词"""
         return name in self.DEFAULT_PROMPTS
 
-class SRTEntry:
-    """表示SRT文件中的一个字幕条目"""
-    def __init__(self, number: int, start_time: str, end_time: str, content: str):
-        self.number = number
-        self.start_time = start_time
-        self.end_time = end_time
-        self.content = content.strip()
-    
-    def to_string(self) -> str:
-        """将字幕条目转换为SRT格式字符串"""
-        return f"{self.number}\n{self.start_time} --> {self.end_time}\n{self.content}\n"
-    
-    def __str__(self) -> str:
-        return self.to_string()
-    
-    def __repr__(self) -> str:
-        return f"SRTEntry({self.number}, {self.start_time}, {self.end_time}, {self.content})"
+# 进度写盘的节流参数：距上次保存超过指定秒数，或每完成指定数量的批次才写一次
+PROGRESS_SAVE_INTERVAL = 2.0
+PROGRESS_SAVE_EVERY = 16
+
+# 写出SRT文件时每次拼接写入的条目数
+WRITE_CHUNK_ENTRIES = 4096
+
+# 并行处理批次时检查取消信号的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.5
+
+# 尚未写盘的进度管理器，程序退出时统一写入
+_unsaved_progress_managers = weakref.WeakSet()
+
+@atexit.register
+def _flush_unsaved_progress() -> None:
+    """程序退出时写入所有尚未保存的进度"""
+    for progress_manager in list(_unsaved_progress_managers):
+        progress_manager.flush()
+
+def _split_loose_separators(text: str, expected_count: int) -> Optional[List[str]]:
+    """按宽松的分隔符格式拆分译文，数量与预期一致时返回拆分结果，否则返回None"""
+    parts = [part.strip() for part in _LOOSE_SEPARATOR_RE.split(text)]
+    # 模型在开头或结尾多输出了一个分隔符时，去掉产生的空段
+    if len(parts) == expected_count + 1:
+        if not parts[0]:
+            parts = parts[1:]
+        elif not parts[-1]:
+            parts = parts[:-1]
+    if len(parts) == expected_count:
+        return parts
+    return None
 
 class ProgressManager:
     """管理翻译进度，支持断点续接"""
@@ -222,7 +257,9 @@ class ProgressManager:
         self.progress_file = f"{output_base}_progress{range_tag}.json"
         self.total_batches = total_batches
         self.completed_batches = set()
-        self.lock = threading.RLock()  # 添加线程锁以保证线程安全
+        self.lock = threading.Lock()  # 添加线程锁以保证线程安全（不可重入，持锁的方法内部只调用_save_locked）
+        self._dirty = False             # 是否有尚未写盘的进度
+        self._last_save_time = 0.0
         self.load_progress()
     
     def load_progress(self) -> None:
@@ -244,22 +281,43 @@ class ProgressManager:
     def save_progress(self) -> None:
         """保存当前进度"""
         with self.lock:
-            try:
-                with open(self.progress_file, 'w', encoding='utf-8') as f:
-                    progress_data = {
-                        "total_batches": self.total_batches,
-                        "completed_batches": sorted(list(self.completed_batches))
-                    }
-                    json.dump(progress_data, f, ensure_ascii=False, indent=2)
-                logger.debug(f"已保存进度: 总批次 {self.total_batches}, 已完成 {len(self.completed_batches)} 个批次")
-            except Exception as e:
-                logger.error(f"保存进度文件出错: {e}")
+            self._save_locked()
+    
+    def _save_locked(self) -> None:
+        """写入进度文件（调用方需已持有self.lock）"""
+        try:
+            progress_data = {
+                "total_batches": self.total_batches,
+                "completed_batches": sorted(self.completed_batches)
+            }
+            # 先写临时文件再替换，避免写入中途退出导致进度文件损坏
+            temp_file = f"{self.progress_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(progress_data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.progress_file)
+            self._dirty = False
+            self._last_save_time = time.monotonic()
+            _unsaved_progress_managers.discard(self)
+            logger.debug("已保存进度: 总批次 %d, 已完成 %d 个批次", self.total_batches, len(self.completed_batches))
+        except Exception as e:
+            logger.error(f"保存进度文件出错: {e}")
     
     def mark_batch_completed(self, batch_number: int) -> None:
-        """标记一个批次为已完成状态"""
+        """标记一个批次为已完成状态（节流写盘，未写入的进度由flush补写）"""
         with self.lock:
             self.completed_batches.add(batch_number)
-            self.save_progress()
+            self._dirty = True
+            if (time.monotonic() - self._last_save_time >= PROGRESS_SAVE_INTERVAL
+                    or len(self.completed_batches) % PROGRESS_SAVE_EVERY == 0):
+                self._save_locked()
+            else:
+                _unsaved_progress_managers.add(self)
+    
+    def flush(self) -> None:
+        """将尚未写盘的进度立即写入文件"""
+        with self.lock:
+            if self._dirty:
+                self._save_locked()
     
     def is_batch_completed(self, batch_number: int) -> bool:
         """检查批次是否已完成"""
@@ -270,7 +328,7 @@ class ProgressManager:
         """更新总批次数"""
         with self.lock:
             self.total_batches = total_batches
-            self.save_progress()
+            self._save_locked()
     
     def get_remaining_batches(self) -> List[int]:
         """获取剩余未完成的批次编号列表"""
@@ -309,18 +367,18 @@ class ProgressManager:
                 logger.info(f"发现 {len(existing_files)} 个已存在的批次文件")
                 for batch_number in existing_files:
                     self.completed_batches.add(batch_number)
-                self.save_progress()
+                self._save_locked()
                 
                 if self.total_batches == 0:
                     # 如果没有总批次信息，则使用最大批次号作为估计
                     max_batch = max(existing_files.keys())
                     self.total_batches = max_batch
-                    self.save_progress()
+                    self._save_locked()
                     logger.info(f"根据现有文件估计总批次数: {max_batch}")
 
 class TranslationAPI:
     """翻译API接口"""
-    def __init__(self, api_type: str, api_key: str, model_name: str = None, custom_prompt: str = ""):
+    def __init__(self, api_type: str, api_key: str, model_name: str = None, custom_prompt: str = "", pool_size: int = 10):
         self.api_type = api_type.lower()
         self.api_key = api_key
         self.custom_prompt = custom_prompt
@@ -338,24 +396,40 @@ class TranslationAPI:
             raise ValueError(f"未知的API类型: {api_type}，无法确定默认模型名称")
         
         self.endpoint = API_ENDPOINTS[self.api_type]
+        
+        # 复用HTTP连接：所有批次共享一个会话，避免每次请求重新建立TCP/TLS连接
+        # 连接池大小与并发线程数一致，保证每个工作线程都有可复用的连接
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # 系统消息在整个翻译过程中不变，只构建一次
+        self.system_message = self._build_system_message()
+        
+        # 译文缓存：相同的原文（及上下文）不再重复请求API
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        # 正在请求中的翻译：缓存键 -> Future，供相同请求的其他线程等待
+        self._inflight = {}
+        
+        # 限流冷却：任一线程收到429后，所有线程都等到该时间点(time.monotonic)之后再发送请求
+        self._cooldown_until = 0.0
+        self._cooldown_lock = threading.Lock()
+        
         logger.info(f"使用 {self.api_type} API ({self.model_name or '无指定模型'}) 进行翻译")
         logger.info(f"API端点: {self.endpoint}")
         if custom_prompt:
             logger.info(f"使用自定义提示词: {custom_prompt[:50]}...")  # 只显示前50字符
     
-    def translate(self, text: str, context: Optional[str] = None) -> str:
-        """翻译文本，可选提供上下文"""
-        if not text.strip():
-            return ""
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        # 构建系统消息，如果有自定义提示词则使用，否则使用默认
+    def _build_system_message(self) -> str:
+        """构建系统消息，如果有自定义提示词则使用，否则使用默认"""
         if self.custom_prompt:
-            system_message = (
+            return (
                 f"{self.custom_prompt} "
                 "请直接提供翻译结果，不要包含任何其他内容。不要添加'翻译如下'、'翻译结果'等前缀。"
                 "不要添加说明、解释或额外的内容，只返回翻译后的文本。"
@@ -366,7 +440,7 @@ class TranslationAPI:
                 "每条字幕必须在你的回复中都有对应的翻译，不多也不少。"
             )
         else:
-            system_message = (
+            return (
                 "你是专业的字幕翻译专家，负责将字幕从外语翻译成中文。翻译质量要好，要信达雅，阅读起来要流畅。"
                 "请直接提供翻译结果，不要包含任何其他内容。不要添加'翻译如下'、'翻译结果'等前缀。"
                 "不要添加说明、解释或额外的内容，只返回翻译后的文本。"
@@ -390,7 +464,52 @@ class TranslationAPI:
                 "这些分隔符用于区分不同的字幕条目，必须在输出中保留。"
                 "每条字幕必须在你的回复中都有对应的翻译，不多也不少。"
             )
+    
+    def _cache_key(self, text: str, context: Optional[str]) -> Tuple[str, str, str, str]:
+        """生成缓存键：模型、提示词、上下文和原文都相同时才视为同一请求"""
+        return (self.model_name or "", self.custom_prompt, context or "", text)
+    
+    def cache_translation(self, text: str, translated_text: str) -> None:
+        """缓存单条原文（无上下文）的译文，供后续相同字幕直接复用"""
+        if text.strip() and translated_text:
+            with self._cache_lock:
+                self._cache.setdefault(self._cache_key(text, None), translated_text)
+    
+    def translate(self, text: str, context: Optional[str] = None) -> str:
+        """翻译文本，可选提供上下文"""
+        if not text.strip():
+            return ""
+        
+        cache_key = self._cache_key(text, context)
+        pending = None
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached is None:
+                # 相同请求正在由其他线程翻译时，等待其结果而不是重复请求API
+                pending = self._inflight.get(cache_key)
+                if pending is None:
+                    future = self._inflight[cache_key] = concurrent.futures.Future()
+        if cached is not None:
+            logger.debug("命中译文缓存，跳过API请求")
+            return cached
+        if pending is not None:
+            logger.debug("相同内容正在翻译中，等待其结果")
+            return pending.result()
         
+        try:
+            translated_text = self._request_translation(text, context, cache_key)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(translated_text)
+            return translated_text
+        finally:
+            with self._cache_lock:
+                del self._inflight[cache_key]
+    
+    def _request_translation(self, text: str, context: Optional[str], cache_key: Tuple[str, str, str, str]) -> str:
+        """请求API翻译文本（带重试），成功后写入译文缓存"""
         user_message = text
         if context:
             user_message = f"上下文信息：{context}\n\n要翻译的内容：{text}\n\n请直接提供翻译结果，不要添加任何前缀或说明，保持所有原始的分隔标记。"
@@ -398,7 +517,7 @@ class TranslationAPI:
         payload = {
             "model": self.model_name,
             "messages": [
-                {"role": "system", "content": system_message},
+                {"role": "system", "content": self.system_message},
                 {"role": "user", "content": user_message}
             ],
             "temperature": 0.8,  # 较低的温度以确保翻译的一致性
@@ -411,7 +530,8 @@ class TranslationAPI:
         
         for attempt in range(max_retries):
             try:
-                response = requests.post(self.endpoint, headers=headers, json=payload, timeout=60)  # 增加超时时间
+                self._wait_for_cooldown()
+                response = self.session.post(self.endpoint, json=payload, timeout=60)  # 增加超时时间
                 response.raise_for_status()
                 
                 response_data = response.json()
@@ -421,77 +541,84 @@ class TranslationAPI:
                     translated_text = response_data["choices"][0]["message"]["content"]
                 
                 # 清理模型可能生成的多余文本
-                translated_text = self.clean_model_prefixes(translated_text)
+                translated_text = self.clean_model_prefixes(translated_text).strip()
                 
-                return translated_text.strip()
+                with self._cache_lock:
+                    self._cache[cache_key] = translated_text
+                return translated_text
             
             except requests.exceptions.RequestException as e:
                 # 计算当前尝试的延迟时间（采用指数退避策略，但设置上限）
                 current_delay = min(retry_delay * (2 ** attempt), max_delay)
                 
-                logger.error(f"API请求错误 (尝试 {attempt+1}/{max_retries}): {e}")
-                logger.info(f"将在 {current_delay:.1f} 秒后重试...")
+                # 被限流(429)时按服务器给出的Retry-After等待，并让其他线程一起暂停
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code == 429:
+                    retry_after = self._retry_after_seconds(response)
+                    if retry_after is not None:
+                        # 服务器给出的等待时间同样不超过最大延迟
+                        current_delay = min(retry_after, max_delay)
+                    logger.warning("API限流(429)，所有线程暂停 %.1f 秒", current_delay)
+                    self._start_cooldown(current_delay)
+                
+                logger.error("API请求错误 (尝试 %d/%d): %s", attempt + 1, max_retries, e)
+                logger.info("将在 %.1f 秒后重试...", current_delay)
                 
                 if attempt < max_retries - 1:
                     time.sleep(current_delay)
                 else:
-                    logger.error(f"达到最大重试次数 ({max_retries})，翻译失败")
+                    logger.error("达到最大重试次数 (%d)，翻译失败", max_retries)
                     raise Exception(f"翻译API在 {max_retries} 次尝试后失败: {e}")
             
         return text  # 如果所有尝试都失败，返回原始文本
     
+    @staticmethod
+    def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+        """解析Retry-After响应头（秒数格式），无法解析时返回None"""
+        try:
+            return max(0.0, float(response.headers.get("Retry-After", "")))
+        except ValueError:
+            return None
+    
+    def _start_cooldown(self, delay: float) -> None:
+        """进入限流冷却期，在此之前所有线程都不再发送请求"""
+        with self._cooldown_lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+    
+    def _wait_for_cooldown(self) -> None:
+        """如果处于限流冷却期，等待冷却结束"""
+        remaining = self._cooldown_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+    
     def clean_model_prefixes(self, text: str) -> str:
         """清理模型可能生成的多余前缀和说明性文本"""
-        # 常见的模型生成的前缀模式
-        prefixes = [
-            r"^翻译如下[:：]?\s*",
-            r"^翻译结果[:：]?\s*",
-            r"^以下是翻译[:：]?\s*",
-            r"^中文翻译[:：]?\s*",
-            r"^要翻译的内容[:：]?\s*",
-            r"^这是中文翻译[:：]?\s*",
-            r"^翻译成中文[:：]?\s*",
-            r"^翻译后的文本[:：]?\s*"
-        ]
-        
-        result = text
-        for prefix in prefixes:
-            result = re.sub(prefix, "", result, flags=re.MULTILINE)
-        
-        return result.strip()
+        # 所有前缀都包含"翻译"，不含该词时无需正则扫描
+        if "翻译" in text:
+            text = _MODEL_PREFIX_RE.sub("", text)
+        return text.strip()
 
 class SRTTranslator:
     """SRT字幕翻译器"""
-    def __init__(self, api_type: str, api_key: str, batch_size: int = 5, context_size: int = 2, max_workers: int = 1, model_name: str = None, custom_prompt: str = ""):
-        self.translation_api = TranslationAPI(api_type, api_key, model_name, custom_prompt)
+    def __init__(self, api_type: str, api_key: str, batch_size: int = 5, context_size: int = 2, max_workers: int = 1, model_name: str = None, custom_prompt: str = "", max_batch_chars: int = 0):
+        self.translation_api = TranslationAPI(api_type, api_key, model_name, custom_prompt, pool_size=max_workers)
         self.batch_size = batch_size  # 每批处理的字幕条数
+        self.max_batch_chars = max_batch_chars  # 每批最大字符数（0表示只按条数分批）
+        self._batch_bounds = []  # 当前翻译任务各批次的(起始索引, 结束索引)
         self.context_size = context_size  # 上下文大小（每侧的条目数）
         self.max_workers = max_workers  # 最大并发工作线程数
+        self._batch_results = {}  # 本次运行中已写入的批次结果（批次文件路径 -> 条目），合并时无需重新读取解析
     
     def parse_srt_file(self, srt_file_path: str) -> List[SRTEntry]:
         """解析SRT文件，返回字幕条目列表"""
         try:
-            with open(srt_file_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-            
-            # 确保文件末尾有换行符，这样正则表达式更容易匹配最后一个条目
-            if not content.endswith('\n'):
-                content += '\n'
-            
-            entries = []
-            for match in SRT_PATTERN.finditer(content):
-                number = int(match.group(1))
-                start_time = match.group(2)
-                end_time = match.group(3)
-                subtitle_content = match.group(4)
-                
-                entries.append(SRTEntry(number, start_time, end_time, subtitle_content))
+            entries = list(iter_srt_file(srt_file_path))
             
-            logger.info(f"已从 {srt_file_path} 解析 {len(entries)} 个字幕条目")
+            logger.info("已从 %s 解析 %d 个字幕条目", srt_file_path, len(entries))
             return entries
         
         except Exception as e:
-            logger.error(f"解析SRT文件 {srt_file_path} 出错: {e}")
+            logger.error("解析SRT文件 %s 出错: %s", srt_file_path, e)
             raise
     
     def translate_subtitle_batch(self, entries: List[SRTEntry], start_idx: int, end_idx: int) -> List[SRTEntry]:
@@ -512,7 +639,7 @@ class SRTTranslator:
                 # 创建翻译后的条目
                 return [SRTEntry(entry.number, entry.start_time, entry.end_time, translated_content.strip())]
             except Exception as e:
-                logger.error(f"翻译单个条目 {entry.number} 失败: {e}")
+                logger.error("翻译单个条目 %d 失败: %s", entry.number, e)
                 # 如果翻译失败，返回原始条目
                 return [entry]
         
@@ -538,49 +665,31 @@ class SRTTranslator:
         
         # 使用更强大的分隔符，确保API能正确区分
         # 使用带有编号的分隔符，帮助模型理解分隔符的作用
-        separator = "\n===SUBTITLE_SEPARATOR_{index}===\n"
-        combined_content = ""
-        
-        for i, content in enumerate(contents_to_translate):
-            if i > 0:
-                combined_content += separator.format(index=i)
-            combined_content += content
+        combined_parts = [contents_to_translate[0]]
+        for i, content in enumerate(contents_to_translate[1:], 1):
+            combined_parts.append(f"\n===SUBTITLE_SEPARATOR_{i}===\n{content}")
+        combined_content = "".join(combined_parts)
         
         try:
             # 翻译
             translated_combined = self.translation_api.translate(combined_content, context)
             
-            # 分割翻译结果 - 使用与合并时相同的分隔符
-            translated_contents = []
-            for i in range(len(contents_to_translate)):
-                if i == 0:
-                    # 第一部分没有前置分隔符
-                    parts = translated_combined.split(separator.format(index=1), 1)
-                    if len(parts) > 0:
-                        translated_contents.append(parts[0].strip())
-                    
-                    if len(parts) == 1:
-                        # 如果只有一部分，说明分隔符没有正确使用，需要备用方法
-                        break
-                    
-                    translated_combined = parts[1]  # 更新剩余内容
-                elif i < len(contents_to_translate) - 1:
-                    # 中间部分有前后分隔符
-                    parts = translated_combined.split(separator.format(index=i+1), 1)
-                    if len(parts) > 1:
-                        translated_contents.append(parts[0].strip())
-                        translated_combined = parts[1]  # 更新剩余内容
-                    else:
-                        # 如果分隔符没找到，退出循环
-                        translated_contents.append(parts[0].strip())
-                        break
-                else:
-                    # 最后一部分没有后置分隔符
-                    translated_contents.append(translated_combined.strip())
+            # 分割翻译结果：一次扫描按所有分隔符切分，最多切出与原文相同的份数（多余内容留在最后一条中）
+            translated_contents = [
+                part.strip()
+                for part in _SEPARATOR_SPLIT_RE.split(translated_combined, maxsplit=len(contents_to_translate) - 1)
+            ]
+            
+            # 分隔符被模型改动（空格、换行或等号数量变化）时，先宽松匹配补救，避免再次请求API
+            if len(translated_contents) != len(batch_entries):
+                salvaged_contents = _split_loose_separators(translated_combined, len(batch_entries))
+                if salvaged_contents is not None:
+                    logger.info("分隔符格式有变化，已通过宽松匹配拆分翻译结果")
+                    translated_contents = salvaged_contents
             
             # 备用方法：如果分隔符方法失败，尝试使用默认分隔方法
             if len(translated_contents) != len(batch_entries):
-                logger.warning(f"翻译结果数量不匹配: 期望 {len(batch_entries)} 个, 得到 {len(translated_contents)} 个")
+                logger.warning("翻译结果数量不匹配: 期望 %d 个, 得到 %d 个", len(batch_entries), len(translated_contents))
                 
                 # 根据批次大小决定如何拆分和处理
                 if len(batch_entries) > 2:
@@ -608,6 +717,8 @@ class SRTTranslator:
             translated_entries = []
             for i, entry in enumerate(batch_entries):
                 translated_content = translated_contents[i].strip()
+                # 缓存每条字幕的译文，重复出现的相同字幕单独翻译时无需再请求API
+                self.translation_api.cache_translation(entry.content, translated_content)
                 
                 translated_entries.append(
                     SRTEntry(entry.number, entry.start_time, entry.end_time, translated_content)
@@ -616,7 +727,7 @@ class SRTTranslator:
             return translated_entries
         
         except Exception as e:
-            logger.error(f"翻译批次失败: {e}")
+            logger.error("翻译批次失败: %s", e)
             # 如果发生异常，尝试拆分批次
             if end_idx - start_idx > 1:
                 logger.info("翻译异常，尝试拆分批次...")
@@ -626,18 +737,50 @@ class SRTTranslator:
                 return first_half + second_half
             else:
                 # 如果只有一个条目但翻译失败，返回原始条目
-                logger.warning(f"无法翻译条目 {entries[start_idx].number}，使用原始内容")
+                logger.warning("无法翻译条目 %d，使用原始内容", entries[start_idx].number)
                 return [entries[start_idx]]
     
+    def plan_batches(self, range_entries: List[SRTEntry]) -> List[Tuple[int, int]]:
+        """划分批次，返回每个批次的(起始索引, 结束索引)
+        
+        每批最多batch_size条；设置了max_batch_chars时，累计字符数（含分隔符）超出该值也会提前结束当前批次，
+        使每次请求的内容长度更均匀。划分结果只取决于字幕内容和参数，断点续接时批次编号保持一致。
+        """
+        total_entries = len(range_entries)
+        batch_size = max(1, self.batch_size)
+        
+        if self.max_batch_chars <= 0:
+            bounds = [(start, min(start + batch_size, total_entries)) for start in range(0, total_entries, batch_size)]
+        else:
+            bounds = []
+            batch_start = 0
+            batch_chars = 0
+            for idx, entry in enumerate(range_entries):
+                entry_chars = len(entry.content) + _SEPARATOR_OVERHEAD
+                # 当前批次已满（条数或字符数），从此条开始新的批次；单条超长时独立成批
+                if idx > batch_start and (idx - batch_start >= batch_size or batch_chars + entry_chars > self.max_batch_chars):
+                    bounds.append((batch_start, idx))
+                    batch_start = idx
+                    batch_chars = 0
+                batch_chars += entry_chars
+            if batch_start < total_entries:
+                bounds.append((batch_start, total_entries))
+        
+        self._batch_bounds = bounds
+        return bounds
+    
     def process_batch(self, batch_number: int, range_entries: List[SRTEntry], output_base: str, range_tag: str, progress_manager: ProgressManager) -> bool:
         """处理单个批次（用于多线程并行执行）"""
         try:
             # 计算批次的起始和结束索引
-            batch_start = (batch_number - 1) * self.batch_size
-            batch_end = min(batch_start + self.batch_size, len(range_entries))
+            if batch_number <= len(self._batch_bounds):
+                batch_start, batch_end = self._batch_bounds[batch_number - 1]
+            else:
+                batch_start = (batch_number - 1) * self.batch_size
+                batch_end = min(batch_start + self.batch_size, len(range_entries))
             
             thread_name = threading.current_thread().name
-            logger.info(f"[{thread_name}] 处理批次 {batch_number} (条目 {batch_start+1}-{batch_end})")
+            logger.info("[%s] 处理批次 %d (条目 %d-%d)", thread_name, batch_number, batch_start + 1, batch_end)
             
             # 翻译当前批次
             translated_batch = self.translate_subtitle_batch(range_entries, batch_start, batch_end)
@@ -649,18 +792,62 @@ class SRTTranslator:
             # 为每个批次创建一个文件
             batch_output_file = f"{output_base}_batch{range_tag}{batch_number}.srt"
             self.write_srt_entries(translated_batch, batch_output_file)
-            logger.info(f"[{thread_name}] 已将批次 {batch_number} 写入 {batch_output_file}")
+            # 保留与批次文件内容一致的条目，合并时直接使用
+            self._batch_results[batch_output_file] = translated_batch
+            logger.info("[%s] 已将批次 %d 写入 %s", thread_name, batch_number, batch_output_file)
             
             # 标记批次已完成
             progress_manager.mark_batch_completed(batch_number)
             
             return True
         except Exception as e:
-            logger.error(f"处理批次 {batch_number} 出错: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception("处理批次 %d 出错: %s", batch_number, e)
             return False
     
+    def process_batches_parallel(self, batch_numbers: List[int], range_entries: List[SRTEntry], output_base: str, range_tag: str, progress_manager: ProgressManager, cancel_event: Optional[threading.Event] = None) -> None:
+        """使用线程池并行处理批次：最多预先提交 max_workers*2 个任务，每完成一个再提交下一个
+        
+        设置cancel_event后不再提交新的批次，已提交但尚未开始的批次会被取消，正在运行的批次会继续完成
+        """
+        pending_batches = iter(batch_numbers)
+        future_to_batch = {}
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit_next() -> None:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                batch_number = next(pending_batches, None)
+                if batch_number is not None:
+                    future = executor.submit(self.process_batch, batch_number, range_entries, output_base, range_tag, progress_manager)
+                    future_to_batch[future] = batch_number
+            
+            for _ in range(self.max_workers * 2):
+                submit_next()
+            
+            # 等待任务完成，每完成一个批次补充提交一个；有取消信号时定期醒来检查
+            poll_interval = CANCEL_POLL_INTERVAL if cancel_event is not None else None
+            while future_to_batch:
+                done, _ = concurrent.futures.wait(future_to_batch, timeout=poll_interval,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    # 取消排队中尚未开始的批次，避免取消后继续发起API请求
+                    cancelled = [future for future in future_to_batch if future not in done and future.cancel()]
+                    for future in cancelled:
+                        del future_to_batch[future]
+                    if cancelled:
+                        logger.info("已取消 %d 个尚未开始的批次", len(cancelled))
+                for future in done:
+                    batch_number = future_to_batch.pop(future)
+                    try:
+                        if not future.result():
+                            logger.warning("批次 %d 处理失败", batch_number)
+                    except Exception as e:
+                        logger.exception("处理批次 %d 时出现异常: %s", batch_number, e)
+                    submit_next()
+        
+        if cancel_event is not None and cancel_event.is_set():
+            logger.info("检测到取消信号，已停止提交新的批次并取消排队中的批次")
+    
     def translate_srt_file(self, input_file: str, output_file: str, resume: bool = True, start_num: int = None, end_num: int = None) -> None:
         """翻译整个SRT文件或指定范围，支持断点续接和多线程"""
         try:
@@ -677,23 +864,17 @@ class SRTTranslator:
             
             # 确定处理范围
             if start_num is not None and end_num is not None:
-                # 将字幕编号转换为索引
-                start_idx = None
-                end_idx = None
-                
-                # 查找对应字幕编号的索引位置
-                for idx, entry in enumerate(entries):
-                    if entry.number == start_num and start_idx is None:
-                        start_idx = idx
-                    if entry.number == end_num and end_idx is None:
-                        # end_idx需要加1以包含end_num
-                        end_idx = idx + 1
+                # 将字幕编号转换为索引（编号重复时取第一次出现的位置）
+                number_to_idx = {entries[idx].number: idx for idx in range(len(entries) - 1, -1, -1)}
+                start_idx = number_to_idx.get(start_num)
+                end_idx = number_to_idx.get(end_num)
                 
                 if start_idx is None or end_idx is None:
                     logger.error(f"无法找到指定的字幕编号范围 {start_num}-{end_num}")
                     return
                 
-                # 限制处理范围
+                # 限制处理范围（end_idx需要加1以包含end_num）
+                end_idx += 1
                 range_entries = entries[start_idx:end_idx]
                 range_tag = f"_{start_num}_{end_num}"
                 # 特定范围翻译时，直接修改输出文件名带上范围标记
@@ -711,7 +892,7 @@ class SRTTranslator:
             output_base = os.path.splitext(output_file)[0]
             
             # 设置进度管理
-            total_batches = (len(range_entries) + self.batch_size - 1) // self.batch_size
+            total_batches = len(self.plan_batches(range_entries))
             progress_manager = ProgressManager(output_base, total_batches, range_tag)
             
             # 当开启断点续接时，恢复进度
@@ -744,31 +925,15 @@ class SRTTranslator:
             # 检查是否开启多线程
             if self.max_workers > 1:
                 logger.info(f"使用 {self.max_workers} 个线程并行翻译")
-                # 使用线程池并行处理批次
-                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    # 提交所有任务
-                    future_to_batch = {
-                        executor.submit(self.process_batch, batch_number, range_entries, output_base, range_tag, progress_manager): batch_number
-                        for batch_number in remaining_batches
-                    }
-                    
-                    # 等待任务完成
-                    for future in concurrent.futures.as_completed(future_to_batch):
-                        batch_number = future_to_batch[future]
-                        try:
-                            success = future.result()
-                            if not success:
-                                logger.warning(f"批次 {batch_number} 处理失败")
-                        except Exception as e:
-                            logger.error(f"处理批次 {batch_number} 时出现异常: {e}")
-                            import traceback
-                            logger.error(traceback.format_exc())
+                self.process_batches_parallel(remaining_batches, range_entries, output_base, range_tag, progress_manager)
             else:
                 # 单线程顺序处理
                 for batch_number in remaining_batches:
+                    # 不再固定等待：遇到API限流(429)时由TranslationAPI按Retry-After退避
                     self.process_batch(batch_number, range_entries, output_base, range_tag, progress_manager)
-                    # 小睡一下，避免API限制
-                    time.sleep(1)
+            
+            # 所有批次处理结束，写入剩余的进度
+            progress_manager.flush()
             
             # 合并所有批次文件生成输出
             self.merge_batch_files(output_base, actual_output_file, total_batches, range_tag)
@@ -782,69 +947,55 @@ class SRTTranslator:
     def merge_batch_files(self, output_base: str, output_file: str, total_batches: int, range_tag: str = "") -> None:
         """合并所有批次文件到输出文件"""
         try:
-            # 找到所有批次文件
-            all_entries = []
-            
-            for batch_number in range(1, total_batches + 1):
-                batch_file = f"{output_base}_batch{range_tag}{batch_number}.srt"
-                if os.path.exists(batch_file):
-                    try:
-                        batch_entries = self.parse_srt_file(batch_file)
-                        all_entries.extend(batch_entries)
-                    except Exception as e:
-                        logger.error(f"读取批次文件 {batch_file} 出错: {e}")
-            
-            # 按字幕序号排序
-            all_entries.sort(key=lambda entry: entry.number)
-            
-            # 清理翻译内容中可能残留的分隔符
-            for entry in all_entries:
-                # 清除所有形式的分隔符
-                entry.content = self.clean_separator_markers(entry.content)
-            
-            # 写入输出文件
-            self.write_srt_entries(all_entries, output_file)
-            logger.info(f"已合并 {len(all_entries)} 个条目到 {output_file}")
+            # 批次按编号顺序覆盖连续的字幕区间，逐批次流式写出，无需汇总全部条目再排序
+            entry_count = self.write_srt_entries(self._iter_batch_entries(output_base, total_batches, range_tag), output_file)
+            logger.info(f"已合并 {entry_count} 个条目到 {output_file}")
             
         except Exception as e:
             logger.error(f"合并批次文件出错: {e}")
             raise
     
+    def _iter_batch_entries(self, output_base: str, total_batches: int, range_tag: str = "") -> Iterator[SRTEntry]:
+        """按批次顺序逐个产出已清理分隔符的字幕条目，同一时间只保留一个批次的数据"""
+        # 读取一次目录得到已有文件名集合，避免每个批次一次stat调用
+        try:
+            with os.scandir(os.path.dirname(output_base) or '.') as it:
+                present_files = {dir_entry.name for dir_entry in it if dir_entry.is_file()}
+        except OSError:
+            present_files = set()
+        
+        for batch_number in range(1, total_batches + 1):
+            batch_file = f"{output_base}_batch{range_tag}{batch_number}.srt"
+            if os.path.basename(batch_file) not in present_files:
+                continue
+            # 本次运行翻译的批次直接使用内存中的结果（process_batch中已清理过分隔符）
+            batch_entries = self._batch_results.pop(batch_file, None)
+            
+            try:
+                if batch_entries is not None:
+                    yield from batch_entries
+                    continue
+                # 之前运行留下的批次从文件中逐条读取，不先解析成列表
+                for entry in iter_srt_file(batch_file):
+                    # 清除所有形式的分隔符
+                    entry.content = self.clean_separator_markers(entry.content)
+                    yield entry
+            except Exception as e:
+                logger.error("读取批次文件 %s 出错: %s", batch_file, e)
+    
     def clean_separator_markers(self, text: str) -> str:
         """清除文本中的所有分隔符标记和模型生成的多余文本"""
-        # 移除编号分隔符
-        patterns = [
-            r"\n?===SUBTITLE_SEPARATOR_\d+===\n?",  # 带编号的分隔符
-            r"\n?===SUBTITLE_SEPARATOR===\n?",      # 无编号的分隔符
-            r"\n?---\n?",                          # 简单分隔符
-            r"^_\d+===\s*"                         # 下划线数字格式的分隔符 (_45=== 等)
-        ]
-        
+        # 移除各种格式的分隔符（所有分隔符合并为一个正则，一次扫描；不含"==="和"---"时无需扫描）
         result = text
-        for pattern in patterns:
-            if pattern.startswith('^'):  # 对以^开头的模式使用MULTILINE标志
-                result = re.sub(pattern, " ", result, flags=re.MULTILINE)
-            else:
-                result = re.sub(pattern, " ", result)
+        if "===" in result or "---" in result:
+            result = _SEPARATOR_MARKER_RE.sub(" ", result)
         
         # 清理常见的模型生成的前缀
-        prefixes = [
-            r"^翻译如下[:：]?\s*",
-            r"^翻译结果[:：]?\s*",
-            r"^以下是翻译[:：]?\s*",
-            r"^中文翻译[:：]?\s*",
-            r"^要翻译的内容[:：]?\s*",
-            r"^这是中文翻译[:：]?\s*",
-            r"^翻译成中文[:：]?\s*",
-            r"^翻译后的文本[:：]?\s*"
-        ]
-        
-        for prefix in prefixes:
-            result = re.sub(prefix, "", result, flags=re.MULTILINE)
-        
-        # 清理可能多余的空格
-        result = re.sub(r"\s+", " ", result)
-        return result.strip()
+        if "翻译" in result:
+            result = _MODEL_PREFIX_RE.sub("", result)
+        
+        # 清理可能多余的空格（str.split无参数时按任意空白切分，与正则\s+等价且更快）
+        return " ".join(result.split())
     
     def merge_partial_translation(self, original_file: str, partial_file: str, output_file: str, start_num: int, end_num: int) -> None:
         """将部分翻译结果与原始文件合并"""
@@ -853,53 +1004,57 @@ class SRTTranslator:
             original_entries = self.parse_srt_file(original_file)
             partial_entries = self.parse_srt_file(partial_file)
             
-            # 清理翻译内容中可能残留的分隔符
-            for entry in partial_entries:
-                entry.content = self.clean_separator_markers(entry.content)
-            
-            # 创建一个字典，用于快速查找翻译后的条目
-            translated_dict = {entry.number: entry for entry in partial_entries}
+            # 创建一个字典，用于快速查找翻译后的条目（只收录范围内的条目，合并时无需再判断范围）
+            translated_dict = {entry.number: entry for entry in partial_entries
+                               if start_num <= entry.number <= end_num}
             
             # 合并结果
             merged_entries = []
             for entry in original_entries:
-                if start_num <= entry.number <= end_num and entry.number in translated_dict:
-                    # 使用翻译后的内容，但保留原始编号
-                    translated_entry = translated_dict[entry.number]
-                    merged_entries.append(SRTEntry(
-                        entry.number,
-                        entry.start_time,
-                        entry.end_time,
-                        translated_entry.content
-                    ))
-                else:
-                    # 保留原始条目
-                    merged_entries.append(entry)
+                translated_entry = translated_dict.get(entry.number)
+                if translated_entry is not None:
+                    # 使用翻译后的内容，但保留原始编号和时间（原始条目只在此处使用，直接修改即可）
+                    entry.content = translated_entry.content
+                # 未翻译的条目保留原样
+                merged_entries.append(entry)
             
-            # 写入合并后的文件
-            self.write_srt_entries(merged_entries, output_file)
+            # 写入合并后的文件（写入时统一清理所有条目中可能残留的分隔符）
+            self.write_srt_entries(merged_entries, output_file, clean=True)
             logger.info(f"已将部分翻译 ({start_num}-{end_num}) 合并到 {output_file}")
             
         except Exception as e:
             logger.error(f"合并部分翻译出错: {e}")
             raise
     
-    def write_srt_entries(self, entries: List[SRTEntry], output_file: str) -> None:
-        """将字幕条目列表写入SRT文件"""
+    def write_srt_entries(self, entries: Iterable[SRTEntry], output_file: str, clean: bool = False) -> int:
+        """将字幕条目写入SRT文件（可传入列表或生成器），返回写入的条目数
+        
+        调用方负责预先清理分隔符；传入clean=True时在写入前再清理一次
+        """
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for i, entry in enumerate(entries):
-                    # 确保写入前清理分隔符
-                    clean_content = self.clean_separator_markers(entry.content)
-                    clean_entry = SRTEntry(entry.number, entry.start_time, entry.end_time, clean_content)
-                    f.write(clean_entry.to_string())
-                    if i < len(entries) - 1:
-                        f.write("\n")
+            count = 0
+            parts = []
+            with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                for entry in entries:
+                    # 条目之间以空行分隔
+                    if count:
+                        parts.append("\n")
+                    if clean:
+                        entry = SRTEntry(entry.number, entry.start_time, entry.end_time, self.clean_separator_markers(entry.content))
+                    parts.append(entry.to_string())
+                    count += 1
+                    # 按块拼接后一次写入，减少write调用次数，同时不必把整个文件内容留在内存中
+                    if count % WRITE_CHUNK_ENTRIES == 0:
+                        f.write("".join(parts))
+                        parts.clear()
+                if parts:
+                    f.write("".join(parts))
             
-            logger.debug(f"已将 {len(entries)} 个条目写入 {output_file}")
+            logger.debug("已将 %d 个条目写入 %s", count, output_file)
+            return count
         
         except Exception as e:
-            logger.error(f"写入输出文件 {output_file} 出错: {e}")
+            logger.error("写入输出文件 %s 出错: %s", output_file, e)
             raise
 
 def main():
@@ -911,6 +1066,7 @@ def main():
     parser.add_argument("--model", help=f"模型名称 (默认: 根据API类型自动选择)")
     parser.add_argument("--api-endpoint", help="自定义API端点URL (仅当--api=custom时使用)")
     parser.add_argument("--batch-size", type=int, default=5, help="每批处理的字幕条数")
+    parser.add_argument("--max-batch-chars", type=int, default=0, help="每批最大字符数，超出时提前分批 (默认: 0，只按条数分批；续接翻译时需保持不变)")
     parser.add_argument("--context-size", type=int, default=2, help="上下文条目数量")
     parser.add_argument("--no-resume", action="store_true", help="不使用断点续接，重新开始翻译")
     parser.add_argument("--start", type=int, help="开始翻译的字幕编号")
@@ -980,7 +1136,7 @@ def main():
                 logger.info(f"可用的提示词: {', '.join(prompt_manager.get_prompt_names())}")
                 return 1
         
-        translator = SRTTranslator(args.api, args.api_key, args.batch_size, args.context_size, args.threads, args.model, custom_prompt)
+        translator = SRTTranslator(args.api, args.api_key, args.batch_size, args.context_size, args.threads, args.model, custom_prompt, args.max_batch_chars)
         
         translator.translate_srt_file(args.input_file, args.output_file, 
                                       resume=not args.no_resume,
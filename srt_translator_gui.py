@@ -1601,14 +1601,17 @@ class SRTTranslatorApp(ctk.CTk):
                     return
                 
                 # 分批处理
-                total_entries = len(range_entries)
-                num_batches = (total_entries + self.batch_size - 1) // self.batch_size
+                num_batches = len(self.plan_batches(range_entries))
                 
                 # 创建进度管理器
                 from srt_translator import ProgressManager
                 progress_manager = self._current_progress_manager = ProgressManager(output_base, num_batches, range_tag)
                 progress_manager.update_total_batches(num_batches)
                 
+                # 断点续接时先从已存在的批次文件恢复进度（节流写盘可能未记录最后完成的批次）
+                if resume:
+                    progress_manager.recover_from_batch_files()
+                
                 # 检查是否所有批次已完成
                 if progress_manager.is_all_completed() and resume:
                     logger.info(f"所有批次已完成，直接合并结果")
@@ -1635,37 +1638,9 @@ class SRTTranslatorApp(ctk.CTk):
                 
                 # 判断是否使用多线程
                 if self.max_workers > 1 and len(batches_to_process) > 1:
-                    # 使用线程池并行处理多个批次
-                    import concurrent.futures
+                    # 使用线程池并行处理多个批次，取消后不再提交新的批次
                     logger.info(f"使用 {min(self.max_workers, len(batches_to_process))} 个线程并行处理批次")
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                        futures = {}
-                        
-                        for batch_num in batches_to_process:
-                            if cancel_event and cancel_event.is_set():
-                                logger.info("检测到取消信号，停止提交新的批次")
-                                break
-                            
-                            # 计算批次的起始和结束索引
-                            start_idx = (batch_num - 1) * self.batch_size
-                            end_idx = min(start_idx + self.batch_size, total_entries)
-                            
-                            # 提交批次任务到线程池
-                            future = executor.submit(
-                                self.process_batch, batch_num, range_entries, output_base, range_tag, progress_manager
-                            )
-                            futures[future] = batch_num
-                        
-                        # 等待所有任务完成或取消
-                        for future in concurrent.futures.as_completed(futures):
-                            batch_num = futures[future]
-                            try:
-                                future.result()  # 获取结果，会抛出任何异常
-                            except Exception as e:
-                                logger.error(f"批次 {batch_num} 处理失败: {e}")
-                                if cancel_event and cancel_event.is_set():
-                                    logger.info("检测到取消信号，中止所有批次处理")
-                                    break
+                    self.process_batches_parallel(batches_to_process, range_entries, output_base, range_tag, progress_manager, cancel_event)
                 else:
                     # 单线程顺序处理批次
                     logger.info("使用单线程处理批次")
@@ -1682,6 +1657,9 @@ class SRTTranslatorApp(ctk.CTk):
                                 logger.info("检测到取消信号，中止处理")
                                 break
                 
+                # 所有批次处理结束（或已取消），写入剩余的进度
+                progress_manager.flush()
+                
                 # 检查是否已取消
                 if cancel_event and cancel_event.is_set():
                     logger.info("翻译已被用户取消")
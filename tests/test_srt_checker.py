@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+校验工具回归测试：只解析时间码的路径与完整解析的路径结果必须一致
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from srt_parser import iter_srt_file
+from srt_checker import _iter_timecodes
+
+
+class TimecodesOnlyParityTest(unittest.TestCase):
+    """_iter_timecodes 与 iter_srt_file 对空行和序号的判断相同"""
+    
+    def _assert_same_timecodes(self, content: str) -> None:
+        with tempfile.NamedTemporaryFile('w', suffix='.srt', encoding='utf-8', newline='', delete=False) as f:
+            f.write(content)
+        try:
+            expected = [(entry.number, entry.start_time, entry.end_time) for entry in iter_srt_file(f.name)]
+            actual = [entry[:3] for entry in _iter_timecodes(f.name)]
+            self.assertEqual(expected, actual)
+        finally:
+            os.remove(f.name)
+    
+    def test_fullwidth_space_separator_line(self):
+        # 条目之间的分隔行只有全角空格（U+3000）
+        self._assert_same_timecodes(
+            "1\n00:00:01,000 --> 00:00:02,000\n你好\n\u3000\n"
+            "2\n00:00:03,000 --> 00:00:04,000\n世界\n"
+        )
+    
+    def test_nbsp_separator_line(self):
+        # 分隔行只有不换行空格（U+00A0），序号行带全角空格
+        self._assert_same_timecodes(
+            "1\n00:00:01,000 --> 00:00:02,000\nhello\n\u00a0\n"
+            "2\u3000\n00:00:03,000 --> 00:00:04,000\nworld\n"
+        )
+    
+    def test_non_ascii_digit_number(self):
+        # 非ASCII数字的序号行
+        self._assert_same_timecodes(
+            "\u0663\n00:00:01,000 --> 00:00:02,000\ntext\n\n"
+            "4\n00:00:03,000 --> 00:00:04,000\nmore\n"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()